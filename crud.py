@@ -3,9 +3,102 @@ CRUD operations for PYQ and PDF history management.
 Provides database interaction functions for the IntelliJect application.
 """
 
+import functools
+import io
+import logging
+import os
+import shutil
+import sys
+import time
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Connection, Engine, Row
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
 import models
+from database import STREAM_BATCH_SIZE, VECTORSTORE_CACHE_DIR, vectorstore_cache_path
+
+logger = logging.getLogger(__name__)
+
+# Row count from which PostgreSQL loads switch from multi-VALUES INSERT to COPY;
+# data_loader sends batches of exactly this size, so subject loads use COPY
+COPY_THRESHOLD = 5000
+
+_PYQ_COLUMNS = ("subject", "sub_topic", "question", "marks", "year", "semester", "branch", "unit")
+_PYQ_KEY_COLUMNS = ("subject", "question")
+_PYQ_UPDATE_COLUMNS = tuple(c for c in _PYQ_COLUMNS if c not in _PYQ_KEY_COLUMNS)
+
+# Rows fetched per round trip when streaming PYQs
+YIELD_PER = STREAM_BATCH_SIZE
+
+# Seconds a subject list read from the database stays cached in this process
+SUBJECTS_CACHE_TTL = 300
+
+# database mode -> (expiry timestamp, subjects)
+_subjects_cache: Dict[str, tuple] = {}
+
+def invalidate_subjects_cache():
+    """Drop cached subject lists so the next get_subjects call hits the database."""
+    _subjects_cache.clear()
+
+def invalidate_vectorstores(subject: Optional[str] = None):
+    """
+    Drop search vectorstores built from PYQs that have just been written.
+    
+    Updates in place change neither the row count nor max(id) that vectorstores
+    are fingerprinted with, so every write path must call this. Removes the
+    persisted stores (the subject's and the all-subjects one) and, when the
+    RAG pipeline is loaded in this process, its in-memory copies.
+    
+    Args:
+        subject: Subject whose PYQs changed; all subjects when omitted
+    """
+    if subject is None:
+        try:
+            with os.scandir(VECTORSTORE_CACHE_DIR) as entries:
+                paths = [entry.path for entry in entries if entry.is_dir()]
+        except OSError:
+            paths = []
+    else:
+        paths = [vectorstore_cache_path(subject), vectorstore_cache_path()]
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+    
+    # Only touch the pipeline if something already imported it; importing it here
+    # would pull FAISS and LangChain into the data loader
+    rag_pipeline = sys.modules.get("rag_pipeline")
+    if rag_pipeline is not None:
+        rag_pipeline.clear_vectorstore_cache(subject)
+
+# Session.info key holding per-session read results
+_SESSION_CACHE_KEY = "crud_cache"
+
+def cached_on_session(key):
+    """
+    Cache a read-only CRUD function's result on the session it was called with.
+    
+    Repeated calls with the same arguments within one session (one Streamlit
+    rerun) reuse the first result. Write functions clear the cache, and it is
+    discarded with the session. Treat cached results as read-only.
+    
+    Args:
+        key: Callable taking the wrapped function's arguments and returning a hashable key
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(db: Session, *args, **kwargs):
+            if db is None:
+                return func(db, *args, **kwargs)
+            cache = db.info.setdefault(_SESSION_CACHE_KEY, {})
+            cache_key = key(db, *args, **kwargs)
+            if cache_key not in cache:
+                cache[cache_key] = func(db, *args, **kwargs)
+            return cache[cache_key]
+        return wrapper
+    return decorator
+
+def _clear_session_cache(db: Session):
+    """Forget per-session read results after a write."""
+    db.info.pop(_SESSION_CACHE_KEY, None)
 
 def get_subjects(db: Session = None) -> List[str]:
     """
@@ -19,26 +112,53 @@ def get_subjects(db: Session = None) -> List[str]:
     if database_mode == "json" or db is None:
         return load_subjects_from_json()
     
+    cached = _subjects_cache.get(database_mode)
+    if cached and cached[0] > time.monotonic():
+        return list(cached[1])
+    
     # Try database first
     try:
-        subjects = db.query(models.PYQ.subject).distinct().all()
-        result = [subject[0] for subject in subjects if subject[0]]
+        subjects = db.query(models.Subject.name).order_by(models.Subject.name).all()
+        result = [subject[0] for subject in subjects]
         
         # If no subjects in database, fallback to JSON
         if not result:
-            print("📁 No subjects in database, falling back to JSON")
+            logger.info("No subjects in database, falling back to JSON")
             return load_subjects_from_json()
-            
-        return result
+        
+        _subjects_cache[database_mode] = (time.monotonic() + SUBJECTS_CACHE_TTL, result)
+        return list(result)
     except Exception as e:
-        print(f"❌ Error getting subjects from database: {e}")
-        print("📁 Falling back to JSON file")
+        logger.warning("Error getting subjects from database, falling back to JSON file: %s", e)
         return load_subjects_from_json()
 
 
+def refresh_subjects(db: Session):
+    """
+    Add any subject present in the PYQ table to the subjects table.
+    
+    Existing subjects are kept, so subjects created without PYQs stay listed.
+    Does not commit; call it inside the transaction that changed the PYQs.
+    
+    Args:
+        db: Database session
+    """
+    already_listed = select(models.Subject.id).where(models.Subject.name == models.PYQ.subject).exists()
+    missing = (
+        select(models.PYQ.subject)
+        .where(models.PYQ.subject.isnot(None), ~already_listed)
+        .distinct()
+    )
+    db.execute(insert(models.Subject).from_select(["name"], missing))
+    invalidate_subjects_cache()
+
+
 def create_subject(db: Session, subject_name: str) -> bool:
     """
-    Create a dummy PYQ entry for a subject to ensure it appears in subjects list.
+    Create a subject so it appears in the subjects list.
+    
+    Issues a single INSERT ... ON CONFLICT DO NOTHING, so creating an
+    existing subject is a no-op.
     
     Args:
         db: Database session
@@ -48,46 +168,140 @@ def create_subject(db: Session, subject_name: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        # Check if subject already exists
-        existing = db.query(models.PYQ).filter(models.PYQ.subject == subject_name).first()
-        if existing:
-            return True
-            
-        # Create a placeholder PYQ entry for this subject
-        placeholder_pyq = models.PYQ(
-            subject=subject_name,
-            sub_topic="General",
-            question=f"Sample question for {subject_name}",
-            marks=1,
-            year="2024",
-            semester="1",
-            branch="General",
-            unit="1"
-        )
-        
-        db.add(placeholder_pyq)
+        stmt = _dialect_insert()(models.Subject).values(name=subject_name)
+        db.execute(stmt.on_conflict_do_nothing(index_elements=["name"]))
         db.commit()
+        _clear_session_cache(db)
+        invalidate_subjects_cache()
         return True
         
     except Exception as e:
         db.rollback()
-        print(f"❌ Error creating subject {subject_name}: {e}")
+        logger.error("Error creating subject %s: %s", subject_name, e)
         return False
 
-def get_pyqs_by_subject(db: Session, subject: str) -> List[models.PYQ]:
+def get_pyqs_by_subject(db: Session, subject: str) -> Iterator[models.PYQ]:
     """
-    Retrieve all PYQ entries for the given subject.
+    Stream all PYQ entries for the given subject.
+    
+    Rows are fetched YIELD_PER at a time; consume the iterator before closing the session.
     
     Args:
         db: Database session
         subject: Subject name to filter by
         
     Returns:
-        List of PYQ objects
+        Iterator of PYQ objects
+    """
+    return db.query(models.PYQ).filter(models.PYQ.subject == subject).yield_per(YIELD_PER)
+
+def _dialect_insert():
+    """Return the dialect-specific insert() construct that supports ON CONFLICT."""
+    from database import get_database_mode
+
+    if get_database_mode() == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert
+
+def _build_pyq_rows(pyqs: List[Dict], subject: str) -> List[Dict]:
+    """
+    Convert PYQ dictionaries into insert-ready rows, skipping entries without a question.
+    
+    Repeated questions collapse to their last occurrence, since a single
+    upsert statement cannot touch the same row twice.
     """
-    return db.query(models.PYQ).filter(models.PYQ.subject == subject).all()
+    rows = {}
+    for entry in pyqs:
+        question = entry.get("question")
+        if not question:
+            continue
+
+        rows[question] = {
+            "subject": subject,
+            "sub_topic": entry.get("sub_topic", ""),
+            "question": question,
+            "marks": entry.get("marks", 0),
+            "year": entry.get("year", ""),
+            "semester": entry.get("semester", ""),
+            "branch": entry.get("branch", ""),
+            "unit": entry.get("unit", "")
+        }
+    return list(rows.values())
+
+def _copy_csv_field(value) -> str:
+    """
+    Format one value for COPY's CSV format.
+    
+    None becomes an unquoted empty field, which COPY reads as NULL, while
+    strings are always quoted so an empty string stays an empty string.
+    This matches what the executemany path stores.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
 
-def store_pyqs(db: Session, pyqs: List[Dict], subject: str) -> int:
+def _copy_pyq_rows(conn: Connection, rows: List[Dict]):
+    """
+    Stream rows into PostgreSQL with COPY over the given connection.
+    
+    COPY cannot resolve conflicts, so rows land in a staging table first and
+    are upserted into the real table with one INSERT ... SELECT.
+    """
+    table = models.PYQ.__tablename__
+    staging = f"{table}_staging"
+    columns = ", ".join(_PYQ_COLUMNS)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in _PYQ_UPDATE_COLUMNS)
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_csv_field(row[column]) for column in _PYQ_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"CREATE TEMP TABLE {staging} AS SELECT {columns} FROM {table} WITH NO DATA")
+        cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH CSV", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+            f"ON CONFLICT ({', '.join(_PYQ_KEY_COLUMNS)}) DO UPDATE SET {updates}"
+        )
+        cursor.execute(f"DROP TABLE {staging}")
+    finally:
+        cursor.close()
+
+def _list_subject(conn: Connection, subject: str):
+    """Add a subject to the subjects table unless it is already listed."""
+    stmt = _dialect_insert()(models.Subject.__table__).values(name=subject)
+    conn.execute(stmt.on_conflict_do_nothing(index_elements=["name"]))
+
+def _insert_pyq_rows(conn: Connection, rows: List[Dict]):
+    """
+    Upsert rows in bulk through SQLAlchemy Core, bypassing the ORM entirely.
+    
+    Uses a single executemany INSERT ... ON CONFLICT DO UPDATE against the
+    pyqs table (compiled to multi-VALUES batches by SQLAlchemy), or COPY for
+    large PostgreSQL loads through psycopg2, whose cursors provide copy_expert.
+    """
+    from database import get_database_mode
+
+    if (get_database_mode() == "postgresql" and conn.dialect.driver == "psycopg2"
+            and len(rows) >= COPY_THRESHOLD):
+        _copy_pyq_rows(conn, rows)
+        return
+
+    stmt = _dialect_insert()(models.PYQ.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_PYQ_KEY_COLUMNS),
+        set_={column: stmt.excluded[column] for column in _PYQ_UPDATE_COLUMNS}
+    )
+    conn.execute(stmt, rows)
+
+def store_pyqs(db: Session, pyqs: List[Dict], subject: str, commit: bool = True) -> int:
     """
     Store a list of PYQs in the database under the given subject.
     
@@ -95,51 +309,134 @@ def store_pyqs(db: Session, pyqs: List[Dict], subject: str) -> int:
         db: Database session
         pyqs: List of PYQ dictionaries
         subject: Subject name
+        commit: Commit after inserting. Pass False to batch several calls into a
+            caller-managed transaction; errors are then raised for the caller to roll back.
         
     Returns:
         Number of successfully stored PYQs
     """
-    if not pyqs:
+    rows = _build_pyq_rows(pyqs, subject)
+    if not rows:
         return 0
 
-    pyq_objects = []
-    for entry in pyqs:
-        question = entry.get("question")
-        if not question:
-            continue
-
-        pyq_obj = models.PYQ(
-            subject=subject,
-            sub_topic=entry.get("sub_topic", ""),
-            question=question,
-            marks=entry.get("marks", 0),
-            year=entry.get("year", ""),
-            semester=entry.get("semester", ""),
-            branch=entry.get("branch", ""),
-            unit=entry.get("unit", "")
-        )
-        pyq_objects.append(pyq_obj)
+    if not commit:
+        _insert_pyq_rows(db.connection(), rows)
+        _list_subject(db.connection(), subject)
+        _clear_session_cache(db)
+        invalidate_subjects_cache()
+        invalidate_vectorstores(subject)
+        return len(rows)
 
     try:
-        db.add_all(pyq_objects)
+        _insert_pyq_rows(db.connection(), rows)
+        _list_subject(db.connection(), subject)
         db.commit()
-        return len(pyq_objects)
+        _clear_session_cache(db)
+        invalidate_subjects_cache()
+        invalidate_vectorstores(subject)
+        return len(rows)
     except Exception as e:
         db.rollback()
-        print(f"❌ Error storing PYQs: {e}")
+        logger.error("Error storing PYQs: %s", e)
         return 0
 
-def get_all_pyqs(db: Session) -> List[models.PYQ]:
+def bulk_store_pyqs(engine: Engine, pyqs: List[Dict], subject: str) -> int:
     """
-    Get all PYQs from database.
+    Store PYQs through a Core connection of their own, without a Session.
+    
+    Suited to standalone loads that do not need to share a transaction with
+    other ORM work.
+    
+    Args:
+        engine: SQLAlchemy engine
+        pyqs: List of PYQ dictionaries
+        subject: Subject name
+        
+    Returns:
+        Number of successfully stored PYQs
+    """
+    rows = _build_pyq_rows(pyqs, subject)
+    if not rows:
+        return 0
+
+    try:
+        with engine.begin() as conn:
+            _insert_pyq_rows(conn, rows)
+            _list_subject(conn, subject)
+        invalidate_subjects_cache()
+        invalidate_vectorstores(subject)
+        return len(rows)
+    except Exception as e:
+        logger.error("Error storing PYQs: %s", e)
+        return 0
+
+@cached_on_session(key=lambda db, subject, pages, page_size: ("pyq_pages", subject, tuple(pages), page_size))
+def get_pyqs_pages(db: Session, subject: str, pages: List[int], page_size: int) -> List[List[models.PYQ]]:
+    """
+    Fetch several pages of a subject's PYQs with a single query.
+    
+    Issues one ORDER BY id LIMIT/OFFSET query spanning the requested pages
+    and slices the rows in Python, instead of one sorted query per page.
     
     Args:
         db: Database session
+        subject: Subject name to filter by
+        pages: Zero-based page numbers
+        page_size: Number of PYQs per page
         
     Returns:
-        List of all PYQ objects
+        List of PYQ lists, one per requested page in the given order
     """
-    return db.query(models.PYQ).all()
+    if not pages or page_size <= 0:
+        return [[] for _ in pages]
+    
+    first_page = min(pages)
+    span = max(pages) - first_page + 1
+    rows = (
+        db.query(models.PYQ)
+        .filter(models.PYQ.subject == subject)
+        .order_by(models.PYQ.id)
+        .limit(span * page_size)
+        .offset(first_page * page_size)
+        .all()
+    )
+    
+    result = []
+    for page in pages:
+        start = (page - first_page) * page_size
+        result.append(rows[start:start + page_size])
+    return result
+
+def get_all_pyqs(db: Session) -> Iterator[models.PYQ]:
+    """
+    Stream all PYQs from database.
+    
+    Rows are fetched YIELD_PER at a time; consume the iterator before closing the session.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Iterator of PYQ objects
+    """
+    return db.query(models.PYQ).yield_per(YIELD_PER)
+
+def get_all_pyqs_lite(db: Session) -> Iterator[Tuple[int, str, str, float]]:
+    """
+    Stream the columns read-only views need from every PYQ.
+    
+    Returns plain rows rather than ORM objects, skipping identity-map and
+    attribute instrumentation work.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Iterator of (id, subject, question, marks) rows
+    """
+    return db.query(
+        models.PYQ.id, models.PYQ.subject, models.PYQ.question, models.PYQ.marks
+    ).yield_per(YIELD_PER)
 
 def add_pdf_history(db: Session, filename: str, subject: str) -> Optional[models.PDFHistory]:
     """
@@ -157,21 +454,32 @@ def add_pdf_history(db: Session, filename: str, subject: str) -> Optional[models
         history = models.PDFHistory(filename=filename, subject=subject)
         db.add(history)
         db.commit()
-        db.refresh(history)
+        _clear_session_cache(db)
         return history
     except Exception as e:
         db.rollback()
-        print(f"❌ Error adding PDF history: {e}")
+        logger.error("Error adding PDF history: %s", e)
         return None
 
-def get_pdf_history(db: Session) -> List[models.PDFHistory]:
+@cached_on_session(key=lambda db, limit=None: ("pdf_history", limit))
+def get_pdf_history(db: Session, limit: Optional[int] = None) -> List[Row]:
     """
     Get PDF upload history ordered by most recent first.
     
+    Returns plain rows with filename, subject and timestamp attributes rather
+    than ORM objects, skipping identity-map bookkeeping for this read-only list.
+    
     Args:
         db: Database session
+        limit: Optional maximum number of entries to return
         
     Returns:
-        List of PDFHistory objects
+        List of rows with id, filename, subject and timestamp
     """
-    return db.query(models.PDFHistory).order_by(models.PDFHistory.timestamp.desc()).all()
+    history = models.PDFHistory
+    stmt = (
+        select(history.id, history.filename, history.subject, history.timestamp)
+        .order_by(history.timestamp.desc())
+        .limit(limit)
+    )
+    return db.execute(stmt).all()
@@ -3,36 +3,106 @@ Data loader for IntelliJect PYQ database.
 Loads PYQ data from JSON files with PostgreSQL-first, JSON-fallback approach.
 """
 
+import hashlib
 import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, get_database_mode
-from models import Base, PYQ
+from database import get_engine, get_session_factory, get_database_mode, create_missing_indexes
+from models import Base, PYQ, SubjectSource
 import crud
 
-def load_pyqs_from_json(json_file_path: str, subject_name: str) -> list:
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Number of PYQs inserted per batch while streaming a subject file; full
+# batches are large enough for crud to load them with COPY on PostgreSQL
+BATCH_SIZE = crud.COPY_THRESHOLD
+
+# Upper bound on subjects loaded concurrently, each on its own pooled connection
+MAX_LOAD_WORKERS = 4
+
+# Non-negative decimal such as "5", "2.5" or "3."
+_MARKS_RE = re.compile(r'[0-9]+(?:\.[0-9]*)?')
+
+# Directories searched for subject files, in priority order
+SUBJECT_DIRS = ["subjects/", "./", "data/"]
+
+def _scan_subject_dirs(directories: list = SUBJECT_DIRS) -> dict:
     """
-    Load PYQs from a JSON file.
+    List each directory once and map file names to their paths.
+    
+    Earlier directories win when the same file name appears more than once.
+    """
+    available = {}
+    for directory in directories:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        available.setdefault(entry.name, entry.path)
+        except OSError:
+            continue
+    return available
+
+def _parse_marks(value) -> int:
+    """Convert a raw marks value to a whole number, defaulting to 0 when it is not numeric."""
+    if type(value) is int:
+        return value if value >= 0 else 0
+    if isinstance(value, (float, str)) and _MARKS_RE.fullmatch(str(value)):
+        return int(float(value))
+    return 0
+
+def _iter_json_items(file):
+    """Yield top-level array items, streaming with ijson when it is installed."""
+    if ijson is not None:
+        yield from ijson.items(file, 'item', use_float=True)
+    elif orjson is not None:
+        yield from orjson.loads(file.read())
+    else:
+        yield from json.load(file)
+
+def _batched(iterable, size: int):
+    """Yield lists of up to `size` items from an iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def iter_pyqs_from_json(json_file_path: str, subject_name: str):
+    """
+    Lazily yield PYQs from a JSON file.
     
     Args:
         json_file_path: Path to the JSON file
         subject_name: Name of the subject
         
-    Returns:
-        List of PYQ dictionaries
+    Yields:
+        PYQ dictionaries
+        
+    Raises:
+        Exception: If the file cannot be read or parsed
     """
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            
-        pyqs = []
-        for item in data:
+    with open(json_file_path, 'rb') as file:
+        for item in _iter_json_items(file):
             pyq_data = {
                 "subject": subject_name,
                 "sub_topic": item.get("sub_topic", item.get("topic", "General")),
                 "question": item.get("question", ""),
-                "marks": int(item.get("marks", 0)) if str(item.get("marks", 0)).replace('.', '').isdigit() else 0,
+                "marks": _parse_marks(item.get("marks", 0)),
                 "year": str(item.get("year", "2024")),
                 "semester": item.get("semester", ""),
                 "branch": item.get("branch", ""),
@@ -40,31 +110,41 @@ def load_pyqs_from_json(json_file_path: str, subject_name: str) -> list:
             }
             
             if pyq_data["question"].strip():  # Only add if question exists
-                pyqs.append(pyq_data)
-                
-        return pyqs
+                yield pyq_data
+
+def load_pyqs_from_json(json_file_path: str, subject_name: str) -> list:
+    """
+    Load PYQs from a JSON file.
+    
+    Args:
+        json_file_path: Path to the JSON file
+        subject_name: Name of the subject
         
+    Returns:
+        List of PYQ dictionaries
+    """
+    try:
+        return list(iter_pyqs_from_json(json_file_path, subject_name))
     except Exception as e:
         print(f"❌ Error loading {json_file_path}: {e}")
         return []
 
-def create_json_subjects_file(subject_files: dict):
+def create_json_subjects_file(subject_files: dict, available_files: dict = None):
     """
     Create/update subjects.json with available subjects from JSON files.
     
     Args:
         subject_files: Dictionary mapping filenames to subject names
+        available_files: Optional result of a previous directory scan to reuse
     """
-    available_subjects = []
-    possible_paths = ["subjects/", "./", "data/"]
+    if available_files is None:
+        available_files = _scan_subject_dirs()
     
     # Check which JSON files actually exist
-    for filename, subject_name in subject_files.items():
-        for base_path in possible_paths:
-            file_path = os.path.join(base_path, filename)
-            if os.path.exists(file_path):
-                available_subjects.append(subject_name)
-                break
+    available_subjects = [
+        subject_name for filename, subject_name in subject_files.items()
+        if filename in available_files
+    ]
     
     # Create subjects.json with available subjects
     subjects_data = {
@@ -78,14 +158,65 @@ def create_json_subjects_file(subject_files: dict):
     }
     
     try:
-        with open("subjects.json", "w", encoding="utf-8") as file:
-            json.dump(subjects_data, file, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            Path("subjects.json").write_bytes(orjson.dumps(subjects_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open("subjects.json", "w", encoding="utf-8") as file:
+                json.dump(subjects_data, file, indent=2, ensure_ascii=False)
         print(f"✅ Created subjects.json with {len(available_subjects)} subjects")
         return True
     except Exception as e:
         print(f"❌ Error creating subjects.json: {e}")
         return False
 
+def _file_checksum(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _load_subject(subject_name: str, file_path: str):
+    """
+    Replace one subject's PYQs from its JSON file.
+    
+    Runs on its own session and transaction so subjects can load in parallel threads.
+    Subjects whose file is unchanged since their last load are left alone, so
+    their rows and cached vectorstores survive app restarts.
+    
+    Args:
+        subject_name: Name of the subject
+        file_path: Path to the subject's JSON file
+        
+    Returns:
+        Number of PYQs stored, or None if the file has not changed
+    """
+    checksum = _file_checksum(file_path)
+    
+    db = get_session_factory()()
+    try:
+        count = 0
+        with db.begin():
+            source = db.get(SubjectSource, subject_name)
+            if source is not None and source.checksum == checksum:
+                print(f"⏭️ {subject_name} is unchanged, skipping {file_path}")
+                return None
+            
+            print(f"📚 Loading {subject_name} from {file_path}")
+            db.execute(delete(PYQ).where(PYQ.subject == subject_name))
+            
+            # Stream new PYQs in fixed-size batches
+            pyqs = iter_pyqs_from_json(file_path, subject_name)
+            for batch in _batched(pyqs, BATCH_SIZE):
+                count += crud.store_pyqs(db, batch, subject_name, commit=False)
+            db.merge(SubjectSource(subject=subject_name, checksum=checksum))
+        # Evict again once committed, in case a search rebuilt from the old rows meanwhile
+        crud.invalidate_vectorstores(subject_name)
+        return count
+    finally:
+        db.close()
+
 def load_all_subjects():
     """
     Load all PYQ data with PostgreSQL-first, JSON-fallback approach.
@@ -97,8 +228,11 @@ def load_all_subjects():
         "environmental_sciences.json": "Environmental Sciences"
     }
     
+    # Look for JSON files in subjects folder and current directory
+    available_files = _scan_subject_dirs()
+    
     # Always create/update subjects.json for fallback
-    create_json_subjects_file(subject_files)
+    create_json_subjects_file(subject_files, available_files)
     
     database_mode = get_database_mode()
     print(f"🔧 Database mode detected: {database_mode}")
@@ -110,64 +244,64 @@ def load_all_subjects():
     # Try to use PostgreSQL/SQLite
     try:
         # Create tables if they don't exist
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=get_engine())
+        # The upsert in crud.store_pyqs needs uq_pyq_subject_question, which
+        # create_all() never adds to a table created by an older version
+        create_missing_indexes(get_engine())
         print("✅ Database tables created successfully")
         
-        # Look for JSON files in subjects folder and current directory
-        possible_paths = ["subjects/", "./", "data/"]
-        
-        db = SessionLocal()
         total_loaded = 0
         successfully_loaded_subjects = []
+        unchanged_subjects = []
         
-        try:
-            for filename, subject_name in subject_files.items():
-                file_found = False
-                
-                # Try different possible paths
-                for base_path in possible_paths:
-                    file_path = os.path.join(base_path, filename)
-                    
-                    if os.path.exists(file_path):
-                        print(f"📚 Loading {subject_name} from {file_path}")
-                        
-                        pyqs = load_pyqs_from_json(file_path, subject_name)
-                        
-                        if pyqs:
-                            try:
-                                # Clear existing PYQs for this subject
-                                db.query(PYQ).filter(PYQ.subject == subject_name).delete()
-                                
-                                # Store new PYQs
-                                count = crud.store_pyqs(db, pyqs, subject_name)
-                                total_loaded += count
-                                successfully_loaded_subjects.append(subject_name)
-                                print(f"✅ Loaded {count} PYQs for {subject_name}")
-                            except Exception as e:
-                                print(f"❌ Failed to store PYQs for {subject_name}: {e}")
-                                db.rollback()
-                        
-                        file_found = True
-                        break
-                
-                if not file_found:
-                    print(f"⚠️ File {filename} not found in any of: {possible_paths}")
-            
-            db.commit()
-            
-            if total_loaded > 0:
-                print(f"🎉 Successfully loaded {total_loaded} total PYQs across {len(successfully_loaded_subjects)} subjects")
-                print(f"📊 Subjects in database: {successfully_loaded_subjects}")
+        # Resolve which subject files exist before touching the database
+        subject_paths = {}
+        for filename, subject_name in subject_files.items():
+            file_path = available_files.get(filename)
+            if file_path:
+                subject_paths[subject_name] = file_path
             else:
-                print("⚠️ No PYQs loaded into database")
-            
+                print(f"⚠️ File {filename} not found in any of: {SUBJECT_DIRS}")
+        
+        # SQLite allows a single writer, so only PostgreSQL loads subjects concurrently
+        max_workers = min(MAX_LOAD_WORKERS, len(subject_paths)) if database_mode == "postgresql" else 1
+        
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            futures = {
+                executor.submit(_load_subject, subject_name, file_path): subject_name
+                for subject_name, file_path in subject_paths.items()
+            }
+            for future in as_completed(futures):
+                subject_name = futures[future]
+                try:
+                    count = future.result()
+                except Exception as e:
+                    print(f"❌ Failed to store PYQs for {subject_name}: {e}")
+                    continue
+                
+                if count is None:
+                    unchanged_subjects.append(subject_name)
+                elif count:
+                    total_loaded += count
+                    successfully_loaded_subjects.append(subject_name)
+                    print(f"✅ Loaded {count} PYQs for {subject_name}")
+        
+        db = get_session_factory()()
+        try:
+            with db.begin():
+                crud.refresh_subjects(db)
         except Exception as e:
-            db.rollback()
-            print(f"❌ Error during database operations: {e}")
-            print("📁 Fallback: subjects.json will be used instead")
-            
+            print(f"❌ Error refreshing subjects: {e}")
         finally:
             db.close()
+        
+        if total_loaded > 0:
+            print(f"🎉 Successfully loaded {total_loaded} total PYQs across {len(successfully_loaded_subjects)} subjects")
+            print(f"📊 Subjects in database: {successfully_loaded_subjects}")
+        elif unchanged_subjects:
+            print(f"✅ PYQs already up to date for {len(unchanged_subjects)} subjects")
+        else:
+            print("⚠️ No PYQs loaded into database")
             
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
@@ -188,7 +322,7 @@ def test_database_connection():
             return False
         
         # Test database connection
-        db = SessionLocal()
+        db = get_session_factory()()
         try:
             # Try a simple query
             result = db.execute("SELECT 1").fetchone()
@@ -1,100 +1,215 @@
 """
 Database configuration with proper error handling and JSON fallback.
+The engine is created lazily on first use, once per process.
 """
 
 import os
+import re
 import json
-from sqlalchemy import create_engine, text
+import functools
+import logging
+from sqlalchemy import create_engine, func, inspect, select, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SUBJECTS_JSON_PATH = "subjects.json"
+DEFAULT_SUBJECTS = ["Computer Science", "Mathematics", "Physics", "Chemistry", "Biology"]
+
+# Directory holding one persisted FAISS vectorstore per subject (see rag_pipeline)
+VECTORSTORE_CACHE_DIR = "faiss_cache"
+
+def vectorstore_cache_path(subject=None):
+    """Directory a subject's vectorstore is persisted in; "_all" holds the all-subjects store."""
+    name = re.sub(r'[^A-Za-z0-9_-]+', '_', subject) if subject else "_all"
+    return os.path.join(VECTORSTORE_CACHE_DIR, name)
+
+# path -> (mtime, subjects); re-read only when the file changes on disk
+_subjects_json_cache = {}
 
 def load_subjects_from_json():
     """Load subjects from JSON file as fallback"""
     try:
-        with open("subjects.json", "r", encoding="utf-8") as file:
-            data = json.load(file)
-            return data.get("subjects", [])
+        mtime = os.stat(SUBJECTS_JSON_PATH).st_mtime
+        cached = _subjects_json_cache.get(SUBJECTS_JSON_PATH)
+        if cached and cached[0] == mtime:
+            return list(cached[1])
+        
+        with open(SUBJECTS_JSON_PATH, "rb") as file:
+            raw = file.read()
+        data = orjson.loads(raw) if orjson else json.loads(raw)
+        subjects = data.get("subjects", [])
+        _subjects_json_cache[SUBJECTS_JSON_PATH] = (mtime, subjects)
+        return list(subjects)
     except FileNotFoundError:
-        return ["Computer Science", "Mathematics", "Physics", "Chemistry", "Biology"]
+        return list(DEFAULT_SUBJECTS)
     except Exception as e:
-        print(f"❌ Error reading subjects.json: {e}")
-        return ["Computer Science", "Mathematics", "Physics", "Chemistry", "Biology"]
-
-# Initialize variables
-engine = None
-SessionLocal = None
-DATABASE_MODE = "json"
+        logger.error("Error reading subjects.json: %s", e)
+        return list(DEFAULT_SUBJECTS)
 
-# Database setup with proper error handling
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Rows fetched per round trip from server-side (stream_results) cursors
+STREAM_BATCH_SIZE = 1000
 
-if DATABASE_URL:
-    try:
+def _resolve_database_url():
+    """Return (url, mode) from DATABASE_URL, defaulting to local SQLite."""
+    url = os.getenv("DATABASE_URL")
+    if url:
         # Fix postgres:// URL format
-        if DATABASE_URL.startswith("postgres://"):
-            DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-        
-        # Create and test PostgreSQL engine
-        engine = create_engine(
-            DATABASE_URL,
+        if url.startswith("postgres://"):
+            url = url.replace("postgres://", "postgresql://", 1)
+        return url, "postgresql"
+    return "sqlite:///./intelliject.db", "sqlite"
+
+def _engine_options(url, mode):
+    """Keyword arguments for create_engine in the given mode."""
+    if mode == "postgresql":
+        options = dict(
             pool_pre_ping=True,
             pool_recycle=300,
             pool_timeout=20,
+            # Room for concurrent Streamlit sessions; LIFO keeps the warm connections in use
+            pool_size=20,
+            max_overflow=40,
+            pool_use_lifo=True,
+            # Send up to 1000 rows per multi-VALUES INSERT
+            insertmanyvalues_page_size=1000,
+            # Streamed reads otherwise start at a 5-row fetch and grow towards this cap
+            execution_options={"max_row_buffer": STREAM_BATCH_SIZE},
             echo=False
         )
-        
-        # Test connection with a simple query
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        DATABASE_MODE = "postgresql"
-        print("🐘 Using PostgreSQL database")
-        
-    except Exception as e:
-        print(f"❌ PostgreSQL connection failed: {e}")
-        print("📁 Falling back to JSON mode")
-        engine = None
-        SessionLocal = None
-        DATABASE_MODE = "json"
-else:
-    # Try SQLite for local development
+        # Only the psycopg2 dialect accepts executemany_mode; others raise TypeError
+        if make_url(url).get_driver_name() == "psycopg2":
+            options["executemany_mode"] = "values_plus_batch"
+        return options
+    return dict(
+        connect_args={"check_same_thread": False},
+        echo=False
+    )
+
+@functools.lru_cache(maxsize=None)
+def _probe_engine(url):
+    """
+    Run SELECT 1 against the database at most once per process.
+    
+    Uses a throwaway NullPool engine so the probe leaves no pooled
+    connection behind to be inherited by forked workers.
+    """
+    probe = create_engine(url, poolclass=NullPool)
     try:
-        DATABASE_URL = "sqlite:///./intelliject.db"
-        engine = create_engine(
-            DATABASE_URL,
-            connect_args={"check_same_thread": False},
-            echo=False
-        )
-        
-        # Test SQLite connection
-        with engine.connect() as conn:
+        with probe.connect() as conn:
             conn.execute(text("SELECT 1"))
-        
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        DATABASE_MODE = "sqlite"
-        print("🗃️ Using SQLite database")
-        
+    finally:
+        probe.dispose()
+
+@functools.lru_cache(maxsize=None)
+def _build_engine():
+    """
+    Create the engine and session factory on first use.
+    
+    Returns:
+        Tuple of (engine, session factory, mode); engine and session factory are
+        None in JSON fallback mode
+    """
+    url, mode = _resolve_database_url()
+    try:
+        _probe_engine(url)
+        engine = create_engine(url, **_engine_options(url, mode))
+        # expire_on_commit=False keeps committed objects readable without a reload SELECT
+        session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+        logger.info("Using %s database", "PostgreSQL" if mode == "postgresql" else "SQLite")
+        return engine, session_factory, mode
     except Exception as e:
-        print(f"❌ SQLite connection failed: {e}")
-        print("📁 Using JSON fallback mode")
-        engine = None
-        SessionLocal = None
-        DATABASE_MODE = "json"
+        label = "PostgreSQL" if mode == "postgresql" else "SQLite"
+        logger.warning("%s connection failed, falling back to JSON mode: %s", label, e)
+        return None, None, "json"
 
 # Create Base class for model definitions
 Base = declarative_base()
 
+def create_missing_indexes(engine, dedupe: bool = False) -> int:
+    """
+    Create model indexes that an existing database does not have yet.
+    
+    create_all() skips tables that already exist, so indexes added to the
+    models later never reach older databases without this step. A unique
+    index cannot be built over duplicate rows; those are only deleted when
+    dedupe is set (python setup.py --dedupe), keeping the oldest row.
+    Models must be imported before calling this.
+    
+    Args:
+        engine: SQLAlchemy engine
+        dedupe: Delete rows that would violate a missing unique index
+        
+    Returns:
+        Number of indexes created
+    """
+    inspector = inspect(engine)
+    existing = {
+        table.name: {index["name"] for index in inspector.get_indexes(table.name)}
+        for table in Base.metadata.sorted_tables
+        if inspector.has_table(table.name)
+    }
+    
+    created = 0
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in existing.get(table.name, set()):
+                continue
+            try:
+                with engine.begin() as conn:
+                    primary_key = list(table.primary_key.columns)
+                    if dedupe and index.unique and len(primary_key) == 1:
+                        keep = select(func.min(primary_key[0])).group_by(*index.columns)
+                        deleted = conn.execute(table.delete().where(primary_key[0].not_in(keep))).rowcount
+                        if deleted:
+                            logger.warning("Deleted %d duplicate %s rows to build %s", deleted, table.name, index.name)
+                    index.create(bind=conn, checkfirst=True)
+                created += 1
+                logger.info("Created index %s", index.name)
+            except Exception as e:
+                hint = " (run python setup.py --dedupe to remove duplicate rows)" if index.unique and not dedupe else ""
+                logger.warning("Could not create index %s%s: %s", index.name, hint, e)
+    return created
+
+def get_engine():
+    """Returns the SQLAlchemy engine, or None in JSON fallback mode."""
+    return _build_engine()[0]
+
+def get_session_factory():
+    """Returns the session factory, or None in JSON fallback mode."""
+    return _build_engine()[1]
+
 def get_database_mode():
     """Returns current database mode: 'postgresql', 'sqlite', or 'json'"""
-    return DATABASE_MODE
+    return _build_engine()[2]
 
 def get_db_session():
     """Get database session. Returns None if using JSON fallback."""
+    SessionLocal = get_session_factory()
     if SessionLocal:
         try:
             return SessionLocal()
         except Exception as e:
-            print(f"❌ Failed to create database session: {e}")
+            logger.error("Failed to create database session: %s", e)
             return None
     return None
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": get_session_factory,
+    "DATABASE_MODE": get_database_mode,
+}
+
+def __getattr__(name):
+    """Resolve the legacy engine, SessionLocal and DATABASE_MODE attributes on first access."""
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
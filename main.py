@@ -1,33 +1,29 @@
 import streamlit as st
 import os
 import base64
-import fitz  # PyMuPDF
-from io import BytesIO
-from PIL import Image
-import tempfile
-from nltk.tokenize import sent_tokenize
-import nltk
-from dotenv import load_dotenv
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import re
+import logging
+import threading
 from pathlib import Path
 
-# Import your custom modules
-from database import SessionLocal, Base, engine
-from models import PYQ, PDFHistory
-import crud
-from rag_pipeline import semantic_search_db, infer_subtopic
-from utils import extract_text_from_pdf
-from langchain_openai import ChatOpenAI
+# Heavy modules (PyMuPDF, LangChain, the RAG pipeline, database models) are
+# imported where they are first needed to keep app start-up fast
 # Add this at the top of main.py after imports
+# Streamlit re-executes this script on every interaction; set up the database once per process
+@st.cache_resource(show_spinner=False)
 def ensure_database_setup():
     """Ensure database setup with proper error handling"""
     try:
-        from database import get_database_mode, engine, SessionLocal
+        from database import get_database_mode, get_engine, get_session_factory, create_missing_indexes
         from models import Base
         from crud import get_subjects, create_subject
         import data_loader
         
         database_mode = get_database_mode()
+        engine = get_engine()
+        SessionLocal = get_session_factory()
         print(f"🔧 Database mode: {database_mode}")
         
         if database_mode == "json" or engine is None:
@@ -41,6 +37,8 @@ def ensure_database_setup():
         try:
             # ONLY create tables if engine is not None
             Base.metadata.create_all(bind=engine)
+            # create_all() leaves existing tables alone; add indexes they are missing
+            create_missing_indexes(engine)
             print("✅ Database tables created successfully")
             
             # Load PYQ data from subjects folder
@@ -81,8 +79,10 @@ if __name__ == "__main__":
 # Initialize database on startup
 def init_database():
     """Initialize database tables if they don't exist"""
+    from database import Base, get_engine
+    
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=get_engine())
         return True
     except Exception as e:
         st.error(f"❌ Database initialization error: {e}")
@@ -110,9 +110,9 @@ def setup_openai_key():
     st.stop()
     return False
 
-# Function to set background image
-def set_background_image():
-    """Set background image for Streamlit app - works without image file"""
+@st.cache_data(show_spinner=False)
+def _load_background_b64():
+    """Read and base64-encode the background image once; None if no image is found"""
     # Try to find background image in common locations
     possible_paths = [
         "assets/back.png",
@@ -120,18 +120,20 @@ def set_background_image():
         os.path.join("assets", "back.png")
     ]
     
-    image_found = False
-    encoded_string = ""
-    
     for image_path in possible_paths:
         if os.path.exists(image_path):
             try:
                 with open(image_path, "rb") as image_file:
-                    encoded_string = base64.b64encode(image_file.read()).decode()
-                image_found = True
-                break
-            except Exception as e:
+                    return base64.b64encode(image_file.read()).decode()
+            except Exception:
                 continue
+    return None
+
+# Function to set background image
+def set_background_image():
+    """Set background image for Streamlit app - works without image file"""
+    encoded_string = _load_background_b64()
+    image_found = encoded_string is not None
     
     # CSS for Dark Academia Style (works with or without background image)
     if image_found:
@@ -309,13 +311,25 @@ def set_background_image():
         with st.sidebar:
             st.info("💡 Add background image to assets/back.png for enhanced visuals")
 
-def fuzzy_text_search(pdf_page, search_text, threshold=0.7):
+_WS_RE = re.compile(r'\s+')
+# Sentence boundary: whitespace after terminal punctuation, before a capital letter
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+def _search_page(pdf_page, text, cache):
+    """Run pdf_page.search_for, reusing earlier results for the same text when a cache is given"""
+    if cache is None:
+        return pdf_page.search_for(text)
+    if text not in cache:
+        cache[text] = pdf_page.search_for(text)
+    return cache[text]
+
+def fuzzy_text_search(pdf_page, search_text, threshold=0.7, cache=None):
     """Enhanced text search that handles minor variations and formatting differences"""
     # Clean search text
-    clean_search = re.sub(r'\s+', ' ', search_text.strip())
+    clean_search = _WS_RE.sub(' ', search_text.strip())
     
     # Try exact search first
-    exact_results = pdf_page.search_for(clean_search)
+    exact_results = _search_page(pdf_page, clean_search, cache)
     if exact_results:
         return exact_results
     
@@ -327,12 +341,12 @@ def fuzzy_text_search(pdf_page, search_text, threshold=0.7):
         # Try combinations of 3-4 consecutive words
         for i in range(len(words) - 2):
             chunk = ' '.join(words[i:i+3])
-            chunk_results = pdf_page.search_for(chunk)
+            chunk_results = _search_page(pdf_page, chunk, cache)
             results.extend(chunk_results)
             
             if i < len(words) - 3:
                 chunk = ' '.join(words[i:i+4])
-                chunk_results = pdf_page.search_for(chunk)
+                chunk_results = _search_page(pdf_page, chunk, cache)
                 results.extend(chunk_results)
         
         return results
@@ -341,77 +355,252 @@ def fuzzy_text_search(pdf_page, search_text, threshold=0.7):
     results = []
     for word in words:
         if len(word) > 3:  # Skip very short words
-            word_results = pdf_page.search_for(word)
+            word_results = _search_page(pdf_page, word, cache)
             results.extend(word_results)
     
     return results
 
-def highlight_text_in_pdf(pdf_page, text_to_highlight):
-    """Improved function to highlight text in PDF with better text matching"""
-    if not text_to_highlight or text_to_highlight.strip() == "(Answer not found)":
-        return False
+# Answers longer than this almost never match the page verbatim, so the
+# exact-text pass is skipped and highlighting starts at sentence level
+EXACT_MATCH_MAX_CHARS = 200
+
+# Highlight colors as RGB multipliers
+YELLOW = (1, 1, 0)
+ORANGE = (1, 0.8, 0)  # Slightly orange yellow, for phrase-level matches
+
+def find_highlight_rects(pdf_page, text_to_highlight, search_cache=None):
+    """Locate the page areas that match an answer, without modifying the page
+    
+    Pass the same search_cache dict for every answer on a page to avoid
+    repeating identical MuPDF searches. Strategies are tried in order and
+    the first one that finds anything wins.
     
-    highlighted = False
+    Returns:
+        (rects, color) tuple; rects is empty when nothing matched
+    """
+    if not text_to_highlight or text_to_highlight.strip() == "(Answer not found)":
+        return [], YELLOW
     
     # Clean the text
-    clean_text = re.sub(r'\s+', ' ', text_to_highlight.strip())
+    clean_text = _WS_RE.sub(' ', text_to_highlight.strip())
     
-    # Try to highlight the full text first
-    text_instances = fuzzy_text_search(pdf_page, clean_text)
-    for rect in text_instances:
-        try:
-            highlight = pdf_page.add_highlight_annot(rect)
-            highlight.set_colors(stroke=[1, 1, 0])  # Yellow
-            highlight.update()
-            highlighted = True
-        except Exception:
-            continue
-    
-    # If full text highlighting failed, try sentence by sentence
-    if not highlighted:
+    # Try to match the full text first, unless it is too long to match verbatim
+    if len(clean_text) <= EXACT_MATCH_MAX_CHARS:
+        rects = fuzzy_text_search(pdf_page, clean_text, cache=search_cache)
+        if rects:
+            return rects, YELLOW
+    
+    # Then try sentence by sentence
+    rects = []
+    try:
+        sentences = _SENT_SPLIT.split(clean_text)
+        for sentence in sentences:
+            sentence = sentence.strip()
+            if len(sentence) > 15:  # Only highlight substantial sentences
+                rects.extend(fuzzy_text_search(pdf_page, sentence, cache=search_cache))
+    except Exception:
+        pass
+    if rects:
+        return rects, YELLOW
+    
+    # If sentence matching failed, try key phrases
+    words = clean_text.split()
+    if len(words) > 4:
+        # Try chunks of 3-5 words
+        for i in range(0, len(words) - 2, 2):
+            phrase = ' '.join(words[i:i+4])
+            rects.extend(fuzzy_text_search(pdf_page, phrase, cache=search_cache))
+    
+    return rects, ORANGE
+
+def render_page_png(pdf_page, highlights, dpi):
+    """Rasterize a page and paint highlights straight onto the pixels
+    
+    Highlights are multiplied into the image like a highlighter pen, so the
+    PDF never gets annotation objects it would only throw away.
+    
+    Args:
+        pdf_page: PyMuPDF page
+        highlights: (rects, color) tuples from find_highlight_rects
+        dpi: Render resolution
+        
+    Returns:
+        PNG bytes
+    """
+    import fitz  # PyMuPDF
+    
+    pix = pdf_page.get_pixmap(dpi=dpi, alpha=False)
+    if not highlights:
+        return pix.tobytes("png")
+    
+    import numpy as np
+    
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n).copy()
+    # Page coordinates -> rendered pixels, following the page rotation
+    to_pixels = pdf_page.rotation_matrix * fitz.Matrix(dpi / 72, dpi / 72)
+    
+    # One mask per color so overlapping rects are painted only once
+    masks = {}
+    for rects, color in highlights:
+        mask = masks.setdefault(color, np.zeros((pix.h, pix.w), dtype=bool))
+        for rect in rects:
+            box = (fitz.Rect(rect) * to_pixels).irect & fitz.IRect(0, 0, pix.w, pix.h)
+            mask[box.y0:box.y1, box.x0:box.x1] = True
+    
+    for color, mask in masks.items():
+        image[mask] = (image[mask] * np.array(color[:pix.n])).astype(np.uint8)
+    
+    return fitz.Pixmap(pix.colorspace, pix.w, pix.h, image.tobytes(), False).tobytes("png")
+
+# Resolution used to rasterize note pages for display
+RENDER_DPI = 110
+
+# Upper bound on simultaneous LLM requests when answering PYQs in batch
+LLM_MAX_CONCURRENCY = 16
+
+# Maximum number of (page, question) answers kept for reuse across runs
+HIGHLIGHT_CACHE_SIZE = 2048
+
+def highlight_key(note_text, question):
+    """Cache key for an answer; str hashes are memoized, so no slices are allocated"""
+    return (hash(note_text), hash(question))
+
+@st.cache_resource
+def get_highlight_cache():
+    """Answers shared by every run in this process, and the lock guarding them"""
+    return OrderedDict(), threading.Lock()
+
+def lookup_highlight(key):
+    """Return an answer cached by an earlier run, or None"""
+    cache, lock = get_highlight_cache()
+    with lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    return None
+
+def cache_highlight(key, value):
+    """Keep an answer for later runs, evicting the oldest beyond HIGHLIGHT_CACHE_SIZE"""
+    cache, lock = get_highlight_cache()
+    with lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > HIGHLIGHT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def build_highlight_prompt(note_text, question):
+    """Build the prompt asking the LLM which note sentences answer a question"""
+    return f"""
+You are reading a note and a past year question. Identify the sentence(s) from the note that best answer the question.
+
+Question:
+"{question}"
+
+Note:
+\"\"\"{note_text[:2000]}\"\"\"
+
+Instructions:
+- Return ONLY the most relevant sentence(s) from the note that answer the question
+- Use the EXACT wording from the note
+- Do NOT rephrase or explain
+- Do NOT include the question again
+- If no relevant answer exists, return "Answer not found"
+"""
+
+def clean_highlight_result(result):
+    """Normalize an LLM answer, stripping quotes the model may have added"""
+    result = result.strip()
+    if result and not result.startswith("Answer not found"):
+        result = result.strip('"').strip("'")
+    return result
+
+@st.cache_resource
+def get_llm():
+    """Shared chat model so its HTTP connection pool survives reruns and sessions"""
+    from langchain_openai import ChatOpenAI
+    from rag_pipeline import get_http_client
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0, http_client=get_http_client())
+
+@st.cache_data(ttl=60)
+def list_subjects():
+    """Subject names for the selectbox, cached so reruns skip the database"""
+    from database import get_session_factory
+    import crud
+    
+    with get_session_factory()() as db:
+        return tuple(crud.get_subjects(db))
+
+@st.cache_data(ttl=60)
+def list_recent_uploads(limit=5):
+    """(filename, subject) pairs of the latest uploads, cached so reruns skip the database"""
+    from database import get_session_factory
+    import crud
+    
+    with get_session_factory()() as db:
+        return tuple((upload.filename, upload.subject) for upload in crud.get_pdf_history(db, limit=limit))
+
+def display_page_results(page_idx, pdf_page, page_highlights, subtopic, relevant_docs, answers):
+    """Show a rendered page next to its matching PYQs and their answers"""
+    col_img, col_pyqs = st.columns([1.2, 1])
+    
+    with col_img:
+        # Render PDF page with highlights
         try:
-            sentences = sent_tokenize(clean_text)
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if len(sentence) > 15:  # Only highlight substantial sentences
-                    sentence_instances = fuzzy_text_search(pdf_page, sentence)
-                    for rect in sentence_instances:
-                        try:
-                            highlight = pdf_page.add_highlight_annot(rect)
-                            highlight.set_colors(stroke=[1, 1, 0])  # Yellow
-                            highlight.update()
-                            highlighted = True
-                        except Exception:
-                            continue
-        except Exception:
-            pass
-    
-    # If sentence highlighting failed, try key phrases
-    if not highlighted:
-        # Extract key phrases (noun phrases, important terms)
-        words = clean_text.split()
-        if len(words) > 4:
-            # Try highlighting chunks of 3-5 words
-            for i in range(0, len(words) - 2, 2):
-                phrase = ' '.join(words[i:i+4])
-                phrase_instances = fuzzy_text_search(pdf_page, phrase)
-                for rect in phrase_instances:
-                    try:
-                        highlight = pdf_page.add_highlight_annot(rect)
-                        highlight.set_colors(stroke=[1, 0.8, 0])  # Slightly orange yellow
-                        highlight.update()
-                        highlighted = True
-                    except Exception:
-                        continue
+            # PyMuPDF encodes the PNG natively; no alpha channel, no PIL copy
+            png_bytes = render_page_png(pdf_page, page_highlights, RENDER_DPI)
+            
+            # Show highlighting status
+            highlight_status = "🟡 Highlighted" if page_highlights else "⚪ No highlights"
+            st.image(
+                png_bytes, 
+                caption=f"📄 Page {page_idx + 1} - {subtopic} ({highlight_status})", 
+                use_container_width=True
+            )
+            
+        except Exception as e:
+            st.error(f"Could not render page {page_idx + 1}: {e}")
+
+    with col_pyqs:
+        st.markdown(f"### 🔍 Relevant PYQs (Page {page_idx + 1}):")
+        if relevant_docs:
+            for i, (qdoc, highlight) in enumerate(zip(relevant_docs, answers), 1):
+                with st.expander(f"Question {i}", expanded=True):
+                    st.markdown(f"**❓ Question:** {qdoc.page_content}")
+                    metadata = qdoc.metadata
+                    st.markdown(
+                        f"**📊 Details:** "
+                        f"Topic: `{metadata.get('sub_topic', 'N/A')}` | "
+                        f"Marks: `{metadata.get('marks', 'N/A')}` | "
+                        f"Year: `{metadata.get('year', 'N/A')}`"
+                    )
+                    
+                    # Display highlighted answer
+                    if highlight and highlight != "Answer not found":
+                        st.markdown(
+                            f'<div style="background: rgba(212,175,55,0.1); padding: 10px; '
+                            f'border-radius: 6px; border-left: 3px solid #d4af37; margin: 10px 0;">'
+                            f'<strong>💡 Highlighted Answer:</strong><br>{highlight}'
+                            f'</div>', 
+                            unsafe_allow_html=True
+                        )
+                    else:
+                        st.info("❗ No specific answer found in this section")
+        else:
+            st.info("❗ No relevant PYQs found for this page.")
     
-    return highlighted
+    st.divider()
 
 # Initialize app
 def main():
     """Main application function"""
     
+    from dotenv import load_dotenv
+    from database import get_session_factory
+    import crud
+    
     # Setup
     load_dotenv()
+    SessionLocal = get_session_factory()
     
     # Initialize database
     if not init_database():
@@ -421,12 +610,6 @@ def main():
     if not setup_openai_key():
         st.stop()
     
-    # Download NLTK data
-    try:
-        nltk.download('punkt', quiet=True)
-    except:
-        pass
-
     # Streamlit UI setup
     st.set_page_config(page_title="IntelliJect", layout="wide")
     
@@ -438,9 +621,7 @@ def main():
     
     # Get available subjects from database
     try:
-        with SessionLocal() as db:
-            available_subjects = db.query(PYQ.subject).distinct().all()
-            subjects = [subject[0] for subject in available_subjects] if available_subjects else []
+        subjects = list(list_subjects())
     except Exception as e:
         st.error(f"❌ Database connection error: {e}")
         subjects = []
@@ -464,14 +645,13 @@ def main():
     with st.sidebar:
         st.markdown("## 📋 Recent Uploads")
         try:
-            with SessionLocal() as db:
-                recent_uploads = crud.get_pdf_history(db)[:5]
-                if recent_uploads:
-                    for upload in recent_uploads:
-                        st.text(f"📄 {upload.filename[:20]}...")
-                        st.caption(f"Subject: {upload.subject}")
-                else:
-                    st.info("No upload history yet")
+            recent_uploads = list_recent_uploads(limit=5)
+            if recent_uploads:
+                for filename, subject in recent_uploads:
+                    st.text(f"📄 {filename[:20]}...")
+                    st.caption(f"Subject: {subject}")
+            else:
+                st.info("No upload history yet")
         except Exception as e:
             st.error(f"Error loading history: {e}")
     
@@ -481,206 +661,149 @@ def main():
             st.error("❌ Please upload a Notes PDF.")
             st.stop()
     
-        with st.spinner("Processing..."):
-            # Save uploaded file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(pdf_file.read())
-                temp_pdf_path = tmp_file.name
+        import fitz  # PyMuPDF
+        from rag_pipeline import semantic_search_db_batch, infer_subtopics
+        from utils import clean_extracted_text
     
-            # Extract text from PDF
+        with st.spinner("Processing..."):
+            # Open the upload in memory once and reuse it for both text extraction and rendering
+            pdf_doc = None
             try:
-                pages_text = extract_text_from_pdf(temp_pdf_path)
+                pdf_doc = fitz.open(stream=pdf_file.getvalue(), filetype="pdf")
+                pages_text = [clean_extracted_text(page.get_text("text")) for page in pdf_doc]
             except Exception as e:
                 st.error(f"❌ Could not extract text from PDF: {e}")
-                os.unlink(temp_pdf_path)  # Cleanup
+                if pdf_doc is not None:
+                    pdf_doc.close()
                 st.stop()
                 
             if not pages_text:
                 st.error("❌ Could not extract text from PDF.")
-                os.unlink(temp_pdf_path)  # Cleanup
+                pdf_doc.close()
                 st.stop()
     
             # Initialize
             db_session = SessionLocal()
             
             try:
-                llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+                llm = get_llm()
             except Exception as e:
                 st.error(f"❌ OpenAI configuration error: {e}")
                 db_session.close()
-                os.unlink(temp_pdf_path)
+                pdf_doc.close()
                 st.stop()
     
-            pdf_doc = fitz.open(temp_pdf_path)
             total_pages = len(pages_text)
     
             # Progress bar
             progress_bar = st.progress(0)
             
-            # Cache for highlights
-            highlight_cache = {}
-            highlighted_pages = {}  # Track which pages have highlights
+            # Every answer this run needs; unbounded, since the shared cache may
+            # evict entries of a large run before the second pass reads them
+            run_answers = {}
+            total_highlighted = 0  # Pages with at least one highlight
     
             def highlight_answer(note_text, question):
-                cache_key = (note_text[:100], question[:50])
-                if cache_key in highlight_cache:
-                    return highlight_cache[cache_key]
+                cache_key = highlight_key(note_text, question)
+                if cache_key in run_answers:
+                    return run_answers[cache_key]
                 
-                prompt = f"""
-You are reading a note and a past year question. Identify the sentence(s) from the note that best answer the question.
-
-Question:
-"{question}"
-
-Note:
-\"\"\"{note_text[:2000]}\"\"\"
-
-Instructions:
-- Return ONLY the most relevant sentence(s) from the note that answer the question
-- Use the EXACT wording from the note
-- Do NOT rephrase or explain
-- Do NOT include the question again
-- If no relevant answer exists, return "Answer not found"
-"""
                 try:
-                    result = llm.invoke(prompt).content.strip()
-                    # Clean up the result
-                    if result and not result.startswith("Answer not found"):
-                        # Remove quotes if LLM added them
-                        result = result.strip('"').strip("'")
-                    highlight_cache[cache_key] = result
-                    return result
+                    result = clean_highlight_result(llm.invoke(build_highlight_prompt(note_text, question)).content)
                 except Exception as e:
                     print(f"Error in highlight_answer: {e}")
                     return "Answer not found"
+                run_answers[cache_key] = result
+                cache_highlight(cache_key, result)
+                return result
     
             st.info("🔍 Processing pages and highlighting answers...")
     
-            # Process each page - FIRST PASS: Add all highlights
-            for page_idx, page_text in enumerate(pages_text):
-                progress = int(((page_idx + 1) / (total_pages * 2)) * 100)  # First half of progress
-                progress_bar.progress(progress)
-                
-                if not page_text.strip():
-                    continue
+            # Get relevant PYQs for every page with one embedding request and one vectorstore build
+            try:
+                page_to_docs = semantic_search_db_batch(db_session, pages_text, selected_subject, k=3)
+            except Exception as e:
+                print(f"Error in semantic search: {e}")
+                page_to_docs = [[] for _ in pages_text]
     
-                # Get relevant PYQs for this page
-                try:
-                    relevant_docs = semantic_search_db(db_session, page_text, selected_subject, k=3)
-                except Exception as e:
-                    print(f"Error in semantic search for page {page_idx + 1}: {e}")
-                    relevant_docs = []
+            # FIRST PASS: collect one prompt per (page, question) not answered by an earlier run
+            pending_prompts = {}
+            for page_idx, page_text in enumerate(pages_text):
+                for doc in page_to_docs[page_idx]:
+                    cache_key = highlight_key(page_text, doc.page_content)
+                    if cache_key in run_answers or cache_key in pending_prompts:
+                        continue
+                    cached = lookup_highlight(cache_key)
+                    if cached is not None:
+                        run_answers[cache_key] = cached
+                    else:
+                        pending_prompts[cache_key] = build_highlight_prompt(page_text, doc.page_content)
+    
+            # Infer every page's subtopic with one LLM call on a worker thread so it
+            # overlaps with the answer batch below. MuPDF work stays on this thread.
+            subtopic_pool = ThreadPoolExecutor(max_workers=1)
+            subtopic_future = subtopic_pool.submit(infer_subtopics, [page_text[:1000] for page_text in pages_text])
+    
+            # Answer every (page, question) pair with one concurrent batch instead of sequential calls
+            if pending_prompts:
+                results = llm.batch(
+                    list(pending_prompts.values()),
+                    config={"max_concurrency": LLM_MAX_CONCURRENCY},
+                    return_exceptions=True
+                )
+                for cache_key, result in zip(pending_prompts, results):
+                    if isinstance(result, Exception):
+                        print(f"Error in highlight_answer: {result}")
+                        continue
+                    run_answers[cache_key] = clean_highlight_result(result.content)
+                    cache_highlight(cache_key, run_answers[cache_key])
     
-                # Highlight answers in PDF
-                if relevant_docs:
-                    pdf_page = pdf_doc[page_idx]
-                    page_highlighted = False
-                    
-                    for doc in relevant_docs:
-                        question = doc.page_content
-                        highlighted_text = highlight_answer(page_text, question)
-                        
-                        if highlighted_text and highlighted_text != "Answer not found":
-                            # Try to highlight the text in PDF
-                            success = highlight_text_in_pdf(pdf_page, highlighted_text)
-                            if success:
-                                page_highlighted = True
-                    
-                    highlighted_pages[page_idx] = page_highlighted
+            subtopics = subtopic_future.result()
+            subtopic_pool.shutdown()
+            progress_bar.progress(50)  # First half of progress
     
-            st.success("✅ Highlighting completed! Now displaying results...")
+            st.success("✅ Answers ready! Now highlighting and displaying results...")
     
-            # SECOND PASS: Display results with highlighted PDFs
+            # SECOND PASS: highlight each page, then render and display it straight away
             for page_idx, page_text in enumerate(pages_text):
                 progress = int(((page_idx + 1 + total_pages) / (total_pages * 2)) * 100)  # Second half
                 progress_bar.progress(progress)
                 
-                # Get subtopic for this page
-                try:
-                    subtopic = infer_subtopic(page_text[:1000])
-                except:
-                    subtopic = "General"
-    
-                # Get relevant PYQs (same as before)
-                try:
-                    relevant_docs = semantic_search_db(db_session, page_text, selected_subject, k=3)
-                except:
-                    relevant_docs = []
-    
-                # Display page results
-                col_img, col_pyqs = st.columns([1.2, 1])
+                relevant_docs = page_to_docs[page_idx]
+                pdf_page = pdf_doc[page_idx]
                 
-                with col_img:
-                    # Render PDF page with highlights
-                    try:
-                        pdf_page = pdf_doc[page_idx]
-                        pix = pdf_page.get_pixmap(dpi=150)
-                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                        
-                        img_bytes = BytesIO()
-                        img.save(img_bytes, format="PNG")
-                        img_bytes.seek(0)
-                        
-                        # Show highlighting status
-                        highlight_status = "🟡 Highlighted" if highlighted_pages.get(page_idx, False) else "⚪ No highlights"
-                        st.image(
-                            img_bytes, 
-                            caption=f"📄 Page {page_idx + 1} - {subtopic} ({highlight_status})", 
-                            use_container_width=True
-                        )
-                        
-                    except Exception as e:
-                        st.error(f"Could not render page {page_idx + 1}: {e}")
-    
-                with col_pyqs:
-                    st.markdown(f"### 🔍 Relevant PYQs (Page {page_idx + 1}):")
-                    if relevant_docs:
-                        for i, qdoc in enumerate(relevant_docs, 1):
-                            with st.expander(f"Question {i}", expanded=True):
-                                st.markdown(f"**❓ Question:** {qdoc.page_content}")
-                                metadata = qdoc.metadata
-                                st.markdown(
-                                    f"**📊 Details:** "
-                                    f"Topic: `{metadata.get('sub_topic', 'N/A')}` | "
-                                    f"Marks: `{metadata.get('marks', 'N/A')}` | "
-                                    f"Year: `{metadata.get('year', 'N/A')}`"
-                                )
-                                
-                                # Get and display highlighted answer
-                                highlight = highlight_answer(page_text, qdoc.page_content)
-                                
-                                if highlight and highlight != "Answer not found":
-                                    st.markdown(
-                                        f'<div style="background: rgba(212,175,55,0.1); padding: 10px; '
-                                        f'border-radius: 6px; border-left: 3px solid #d4af37; margin: 10px 0;">'
-                                        f'<strong>💡 Highlighted Answer:</strong><br>{highlight}'
-                                        f'</div>', 
-                                        unsafe_allow_html=True
-                                    )
-                                else:
-                                    st.info("❗ No specific answer found in this section")
-                    else:
-                        st.info("❗ No relevant PYQs found for this page.")
+                # Look up each answer once and locate it on the page
+                answers = [highlight_answer(page_text, doc.page_content) for doc in relevant_docs]
+                page_highlights = []
+                search_cache = {}  # shared by every answer on this page
+                for answer in answers:
+                    if answer and answer != "Answer not found":
+                        rects, color = find_highlight_rects(pdf_page, answer, search_cache)
+                        if rects:
+                            page_highlights.append((rects, color))
+                
+                if page_highlights:
+                    total_highlighted += 1
                 
-                st.divider()
+                display_page_results(page_idx, pdf_page, page_highlights, subtopics[page_idx], relevant_docs, answers)
     
             # Add to history
             try:
                 crud.add_pdf_history(db_session, pdf_file.name, selected_subject)
                 db_session.commit()
+                list_recent_uploads.clear()
             except Exception as e:
                 print(f"Error adding to history: {e}")
     
             # Cleanup
             db_session.close()
             pdf_doc.close()
-            os.unlink(temp_pdf_path)
             progress_bar.progress(100)
             
             # Summary
-            total_highlighted = sum(highlighted_pages.values())
             st.success(f"✅ Processing Complete! Highlighted answers found on {total_highlighted}/{total_pages} pages.")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
     ensure_database_setup()  
     main()
\ No newline at end of file
@@ -1,8 +1,8 @@
 """
 SQLAlchemy database models for IntelliJect.
-Defines the database schema for PYQs and PDF upload history.
+Defines the database schema for PYQs, subjects and PDF upload history.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from datetime import datetime
 from database import Base
 
@@ -24,6 +24,15 @@ class PYQ(Base):
     sub_topic = Column(String, index=True)
     subject = Column(String, nullable=False, index=True)
     
+    __table_args__ = (
+        # Lets reloads upsert instead of duplicating questions
+        Index("uq_pyq_subject_question", "subject", "question", unique=True),
+        # Serves subject lookups and subject + year filters with one index seek
+        Index("ix_pyq_subject_year", "subject", "year"),
+        # Covers DISTINCT subject and subject + sub_topic lookups with an index-only scan
+        Index("ix_pyq_subject_subtopic", "subject", "sub_topic"),
+    )
+    
     def __repr__(self):
         return f"<PYQ(id={self.id}, subject='{self.subject}', marks={self.marks})>"
     
@@ -41,6 +50,42 @@ class PYQ(Base):
             'subject': self.subject
         }
 
+class Subject(Base):
+    """
+    Subject lookup model.
+    
+    Holds one row per subject so the subject list is read without scanning PYQs.
+    """
+    __tablename__ = "subjects"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f"<Subject(id={self.id}, name='{self.name}')>"
+    
+    def to_dict(self):
+        """Convert Subject instance to dictionary."""
+        return {
+            'id': self.id,
+            'name': self.name
+        }
+
+class SubjectSource(Base):
+    """
+    Source file checksum model.
+    
+    Records the JSON file each subject was last loaded from, so unchanged
+    subjects are not reloaded.
+    """
+    __tablename__ = "subject_sources"
+    
+    subject = Column(String, primary_key=True)
+    checksum = Column(String, nullable=False)
+    
+    def __repr__(self):
+        return f"<SubjectSource(subject='{self.subject}', checksum='{self.checksum}')>"
+
 class PDFHistory(Base):
     """
     PDF upload history model.
@@ -2,29 +2,321 @@
 RAG (Retrieval-Augmented Generation) pipeline for IntelliJect.
 Implements semantic search, subtopic inference, and PYQ matching functionality.
 """
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import json
 import os
-from typing import List, Optional
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import faiss
+import httpx
+import numpy as np
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.base import Docstore
 from langchain.docstore.document import Document
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from database import VECTORSTORE_CACHE_DIR, vectorstore_cache_path
 from models import PYQ
+from utils import chunk_text_by_sentences
 
 # Load environment variables
 load_dotenv()
 
+# HNSW graph parameters: neighbours per node, and candidate list sizes while building and searching
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+# From this many PYQs on, an inverted-file index (trained k-means clusters) replaces HNSW
+IVF_MIN_VECTORS = 10000
+# Clusters visited per IVF query
+IVF_NPROBE = 8
+
+# Question embeddings keyed by content hash, shared by every subject's vectorstore.
+# Stored as float16, which halves memory and disk use at no measurable recall cost.
+EMBEDDING_CACHE_PATH = os.path.join(VECTORSTORE_CACHE_DIR, "embeddings.npz")
+
+# Texts sent per embeddings request when filling the cache
+EMBED_BATCH_SIZE = 512
+
+# Entries kept in the in-memory subtopic and query embedding caches
+SUBTOPIC_CACHE_SIZE = 4096
+QUERY_EMBED_CACHE_SIZE = 4096
+
+# Excerpts per batched subtopic request, keeping prompts well inside the context window
+SUBTOPIC_GROUP_SIZE = 20
+# Batched subtopic requests in flight at once
+SUBTOPIC_CONCURRENCY = 8
+
+_WS_RE = re.compile(r'\s+')
+
+# Connection pool shared by every OpenAI client in the process
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE = 32
+HTTP_TIMEOUT = 30
+
+@functools.lru_cache(maxsize=None)
+def get_http_client() -> httpx.Client:
+    """
+    Return the process-wide pooled HTTP client for OpenAI requests.
+    
+    Keeping one pool lets embeddings and chat calls reuse warm TLS
+    connections; HTTP/2 is used when the optional h2 package is installed.
+    Only the sync client is shared: an httpx.AsyncClient's connections are
+    bound to the event loop that opened them, and each asyncio.run call
+    starts a new loop.
+    """
+    return httpx.Client(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+        timeout=HTTP_TIMEOUT
+    )
+
+def _lru_get(cache: OrderedDict, key):
+    """Return a cached value and mark it recently used; None when absent."""
+    try:
+        cache.move_to_end(key)
+        return cache[key]
+    except KeyError:
+        return None
+
+def _lru_put(cache: OrderedDict, key, value, maxsize: int):
+    """Store a value, evicting the least recently used entries beyond maxsize."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
+class PYQDocstore(Docstore):
+    """
+    Columnar docstore for PYQ search results.
+    
+    Keeps questions in one list and metadata as numpy columns, with repeated
+    strings (subject, year, unit, ...) dictionary-encoded, instead of one
+    Document and metadata dict per row. Documents are built when a search
+    returns them. Ids are the row positions "0" to "N-1".
+    """
+    
+    # Metadata fields stored as codes into a table of distinct values, in Document order
+    _ENCODED = ("year", "subject", "sub_topic", "semester", "branch", "unit")
+    
+    def __init__(self):
+        self._questions = []
+        self._marks = []
+        self._values = {field: {} for field in self._ENCODED}
+        self._codes = {field: [] for field in self._ENCODED}
+    
+    def __len__(self) -> int:
+        return len(self._questions)
+    
+    def extend(self, rows):
+        """Append PYQ rows with question, marks and the encoded metadata fields."""
+        for row in rows:
+            self._questions.append(row.question)
+            self._marks.append(np.nan if row.marks is None else row.marks)
+            for field in self._ENCODED:
+                values = self._values[field]
+                self._codes[field].append(values.setdefault(getattr(row, field), len(values)))
+    
+    def freeze(self):
+        """Pack the appended rows into contiguous arrays; call once after the last extend."""
+        self._marks = np.asarray(self._marks, dtype="float64")
+        for field in self._ENCODED:
+            self._codes[field] = np.asarray(self._codes[field], dtype="int32")
+            self._values[field] = tuple(self._values[field])
+    
+    def search(self, search: str):
+        """Build the Document stored under an id, or a not-found message like InMemoryDocstore."""
+        try:
+            i = int(search)
+            question = self._questions[i] if i >= 0 else None
+        except (ValueError, IndexError):
+            question = None
+        if question is None:
+            return f"ID {search} not found."
+        
+        values = {field: self._values[field][self._codes[field][i]] for field in self._ENCODED}
+        marks = self._marks[i]
+        return Document(
+            page_content=question,
+            metadata={
+                "year": values["year"],
+                "subject": values["subject"],
+                "sub_topic": values["sub_topic"],
+                "marks": None if np.isnan(marks) else float(marks),
+                "semester": values["semester"],
+                "branch": values["branch"],
+                "unit": values["unit"]
+            }
+        )
+
 class RAGPipeline:
     """Main RAG pipeline class for PYQ processing."""
     
     def __init__(self):
         """Initialize embeddings and LLM."""
-        self.embeddings = OpenAIEmbeddings()
-        self.llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
+        self.embeddings = OpenAIEmbeddings(http_client=get_http_client())
+        self.llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo", http_client=get_http_client())
+        # subject ("" for all subjects) -> (fingerprint, vectorstore, persisted to disk)
+        self._vs_cache = {}
+        # Bumped by clear_vectorstore_cache
+        self._vs_generation = 0
+        # sha256 of text -> embedding, loaded from disk on first use
+        self._embed_cache = None
+        self._embed_cache_dirty = False
+        # Guards the embedding cache; Streamlit sessions share this pipeline across threads
+        self._embed_lock = threading.RLock()
+        # Normalized text hash -> subtopic / query embedding, bounded LRUs
+        self._subtopic_cache = OrderedDict()
+        self._query_embed_cache = OrderedDict()
+    
+    def _load_embed_cache(self) -> dict:
+        """Return the embedding cache, reading it from disk the first time."""
+        with self._embed_lock:
+            if self._embed_cache is None:
+                self._embed_cache = {}
+                try:
+                    with np.load(EMBEDDING_CACHE_PATH) as data:
+                        self._embed_cache = dict(zip(data["keys"].tolist(), data["vectors"].astype("float16")))
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"⚠️ Ignoring unreadable embedding cache at {EMBEDDING_CACHE_PATH}: {e}")
+            return self._embed_cache
+    
+    def _save_embed_cache(self):
+        """Write the embedding cache to disk, replacing the previous file atomically."""
+        with self._embed_lock:
+            if not self._embed_cache_dirty:
+                return
+            tmp_path = None
+            try:
+                os.makedirs(VECTORSTORE_CACHE_DIR, exist_ok=True)
+                # A unique temp file per save, so concurrent processes never share one
+                fd, tmp_path = tempfile.mkstemp(dir=VECTORSTORE_CACHE_DIR, suffix=".npz")
+                keys = list(self._embed_cache)
+                with os.fdopen(fd, "wb") as file:
+                    np.savez(file, keys=np.array(keys), vectors=np.stack([self._embed_cache[key] for key in keys]))
+                os.replace(tmp_path, EMBEDDING_CACHE_PATH)
+                tmp_path = None
+                self._embed_cache_dirty = False
+            except Exception as e:
+                print(f"⚠️ Could not persist embedding cache to {EMBEDDING_CACHE_PATH}: {e}")
+            finally:
+                if tmp_path is not None:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+    
+    def _embed_texts(self, texts: List[str], persist: bool = True) -> np.ndarray:
+        """
+        Embed texts, only calling the API for texts not embedded before.
+        
+        Args:
+            texts: Texts to embed
+            persist: Write new embeddings to disk now; pass False when embedding
+                in batches and call _save_embed_cache once at the end
+            
+        Returns:
+            float32 matrix with one row per text, in input order
+        """
+        cache = self._load_embed_cache()
+        keys = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+        
+        # One request per batch of distinct, not yet cached texts
+        missing = {}
+        with self._embed_lock:
+            for key, text in zip(keys, texts):
+                if key not in cache:
+                    missing.setdefault(key, text)
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), EMBED_BATCH_SIZE):
+            batch_keys = missing_keys[start:start + EMBED_BATCH_SIZE]
+            # The API call runs unlocked so other sessions can keep reading the cache
+            vectors = self.embeddings.embed_documents([missing[key] for key in batch_keys])
+            with self._embed_lock:
+                for key, vector in zip(batch_keys, vectors):
+                    cache[key] = np.asarray(vector, dtype="float16")
+                self._embed_cache_dirty = True
+        
+        if persist:
+            self._save_embed_cache()
+        with self._embed_lock:
+            return np.stack([cache[key] for key in keys]).astype("float32")
+    
+    def _pyq_fingerprint(self, session: Session, subject: str = None) -> Tuple[int, int]:
+        """Return (max id, row count) of the PYQs a vectorstore would cover."""
+        query = session.query(func.max(PYQ.id), func.count(PYQ.id))
+        if subject:
+            query = query.filter(PYQ.subject == subject)
+        max_id, count = query.one()
+        return (max_id or 0, count)
+    
+    def _vectorstore_path(self, subject: str = None) -> str:
+        """Directory a subject's vectorstore is persisted in."""
+        return vectorstore_cache_path(subject)
+    
+    def _load_persisted_vectorstore(self, subject: str, fingerprint: Tuple[int, int]) -> Optional[FAISS]:
+        """Load a vectorstore from disk if it was built from the same PYQ rows."""
+        path = self._vectorstore_path(subject)
+        try:
+            with open(os.path.join(path, "fingerprint.json"), encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("subject") != subject or tuple(saved.get("fingerprint", ())) != fingerprint:
+                return None
+            # The pickle was written by this process' own cache, never by users
+            vectorstore = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+            self._tune_index(vectorstore.index)
+            return vectorstore
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable vectorstore cache at {path}: {e}")
+            return None
+    
+    def _persist_vectorstore(self, subject: str, fingerprint: Tuple[int, int], vectorstore: FAISS) -> bool:
+        """Save a vectorstore with the fingerprint of the rows it was built from; True on success."""
+        path = self._vectorstore_path(subject)
+        try:
+            vectorstore.save_local(path)
+            with open(os.path.join(path, "fingerprint.json"), "w", encoding="utf-8") as file:
+                json.dump({"subject": subject, "fingerprint": list(fingerprint)}, file)
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not persist vectorstore to {path}: {e}")
+            return False
+    
+    def clear_vectorstore_cache(self, subject: str = None):
+        """
+        Drop cached vectorstores so the next search rebuilds them.
+        
+        Args:
+            subject: Subject to evict; all subjects when omitted
+        """
+        # Builds already running when this is called must not cache their result
+        self._vs_generation += 1
+        if subject is None:
+            self._vs_cache.clear()
+        else:
+            self._vs_cache.pop(subject, None)
+            self._vs_cache.pop("", None)  # the all-subjects store covers it too
     
     def load_vectorstore_from_db(self, session: Session, subject: str = None) -> Optional[FAISS]:
         """
-        Dynamically builds a FAISS vectorstore from PYQs stored in the database.
+        Get a FAISS vectorstore over the PYQs stored in the database.
+        
+        Vectorstores are cached in memory and on disk, and only rebuilt
+        (re-embedding every question) when the PYQ rows change.
         
         Args:
             session: Database session
@@ -33,37 +325,135 @@ class RAGPipeline:
         Returns:
             FAISS vectorstore or None if no PYQs found
         """
-        query_set = session.query(PYQ)
-        if subject:
-            query_set = query_set.filter(PYQ.subject == subject)
-        
-        pyqs = query_set.all()
-        if not pyqs:
+        fingerprint = self._pyq_fingerprint(session, subject)
+        if not fingerprint[1]:
             return None
         
-        # Convert PYQs to documents
-        documents = [
-            Document(
-                page_content=pyq.question,
-                metadata={
-                    "year": pyq.year,
-                    "subject": pyq.subject,
-                    "sub_topic": pyq.sub_topic,
-                    "marks": pyq.marks,
-                    "semester": pyq.semester,
-                    "branch": pyq.branch,
-                    "unit": pyq.unit
-                }
-            )
-            for pyq in pyqs
-        ]
+        cache_key = subject or ""
+        cached = self._vs_cache.get(cache_key)
+        if cached and cached[0] == fingerprint:
+            fingerprint_file = os.path.join(self._vectorstore_path(subject), "fingerprint.json")
+            # A persisted store that has since been deleted was invalidated by
+            # a write, possibly from another process
+            if not cached[2] or os.path.exists(fingerprint_file):
+                return cached[1]
         
+        generation = self._vs_generation
+        persisted = True
+        vectorstore = self._load_persisted_vectorstore(subject, fingerprint)
+        if vectorstore is None:
+            vectorstore = self._build_vectorstore(session, subject)
+            if vectorstore is None:
+                return None
+            if generation != self._vs_generation:
+                return vectorstore  # PYQs changed while building; use once, keep nothing
+            persisted = self._persist_vectorstore(subject, fingerprint, vectorstore)
+        
+        if generation == self._vs_generation:
+            self._vs_cache[cache_key] = (fingerprint, vectorstore, persisted)
+        return vectorstore
+    
+    def _build_vectorstore(self, session: Session, subject: str = None) -> Optional[FAISS]:
+        """
+        Build a FAISS vectorstore from PYQs stored in the database.
+        
+        Args:
+            session: Database session
+            subject: Optional subject filter
+            
+        Returns:
+            FAISS vectorstore or None if no PYQs found
+        """
+        stmt = select(
+            PYQ.question, PYQ.year, PYQ.subject, PYQ.sub_topic,
+            PYQ.marks, PYQ.semester, PYQ.branch, PYQ.unit
+        )
+        if subject:
+            stmt = stmt.where(PYQ.subject == subject)
+        
+        # Stream rows from a server-side cursor and embed them batch by batch,
+        # so only one window of rows is resident alongside the docstore columns
+        rows = session.execute(stmt.execution_options(yield_per=EMBED_BATCH_SIZE))
+        docstore = PYQDocstore()
+        vector_batches = []
         try:
-            vectorstore = FAISS.from_documents(documents, self.embeddings)
-            return vectorstore
+            for batch in rows.partitions():
+                docstore.extend(batch)
+                vector_batches.append(self._embed_texts(
+                    [row.question for row in batch], persist=False
+                ))
+            
+            if not len(docstore):
+                return None
+            docstore.freeze()
+            return self._build_ann_vectorstore(docstore, np.vstack(vector_batches))
         except Exception as e:
             print(f"❌ Error creating vectorstore: {e}")
             return None
+        finally:
+            rows.close()
+            self._save_embed_cache()
+    
+    @staticmethod
+    def _tune_index(index):
+        """Apply search-time parameters, which FAISS does not always persist."""
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = IVF_NPROBE
+        elif isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+    
+    @staticmethod
+    def _build_index(vectors: np.ndarray):
+        """
+        Build an approximate nearest-neighbour index over embedding vectors.
+        
+        Smaller corpora get an HNSW graph; large ones an IVF index with
+        about 4 * sqrt(N) clusters, which is cheaper to build at that size.
+        Both store vectors as float16, halving the bytes scanned per query.
+        
+        Args:
+            vectors: float32 matrix with one row per document
+            
+        Returns:
+            FAISS index containing the vectors
+        """
+        count, dim = vectors.shape
+        if count >= IVF_MIN_VECTORS:
+            quantizer = faiss.IndexFlatL2(dim)
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dim, int(4 * np.sqrt(count)), faiss.ScalarQuantizer.QT_fp16
+            )
+        else:
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, HNSW_M)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        
+        index.train(vectors)
+        RAGPipeline._tune_index(index)
+        index.add(vectors)
+        return index
+    
+    def _build_ann_vectorstore(self, docstore: "PYQDocstore", vectors: np.ndarray) -> FAISS:
+        """
+        Build a FAISS vectorstore backed by an approximate index.
+        
+        Queries probe a graph or a few clusters instead of scanning every
+        vector, so search time grows sub-linearly with the number of PYQs.
+        
+        Args:
+            docstore: PYQs to index, with docstore ids "0" to "N-1"
+            vectors: Embedding of each PYQ, in docstore order
+            
+        Returns:
+            FAISS vectorstore over the PYQs
+        """
+        index = self._build_index(vectors)
+        
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id={i: str(i) for i in range(len(docstore))}
+        )
     
     def semantic_search_db(self, session: Session, query: str, subject: str = None, k: int = 5) -> List[Document]:
         """
@@ -89,6 +479,95 @@ class RAGPipeline:
             print(f"❌ Semantic search error: {e}")
             return []
     
+    def semantic_search_db_batch(self, session: Session, queries: List[str], subject: str = None, k: int = 5) -> List[List[Document]]:
+        """
+        Perform semantic search for several queries at once.
+        
+        Builds the vectorstore once and embeds all queries in a single
+        embeddings request, instead of one build and one request per query.
+        
+        Args:
+            session: Database session
+            queries: Search query texts
+            subject: Optional subject filter
+            k: Number of results to return per query
+            
+        Returns:
+            List of relevant documents for each query, in query order
+        """
+        results = [[] for _ in queries]
+        positions = [i for i, query in enumerate(queries) if query.strip()]
+        if not positions:
+            return results
+        
+        vectorstore = self.load_vectorstore_from_db(session, subject)
+        if not vectorstore:
+            return results
+        
+        try:
+            matches = self.batch_semantic_search(vectorstore, [queries[i] for i in positions], k)
+            for i, docs in zip(positions, matches):
+                results[i] = docs
+        except Exception as e:
+            print(f"❌ Batch semantic search error: {e}")
+        return results
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed search queries, reusing embeddings of recently seen queries.
+        
+        Unlike PYQ embeddings, query embeddings are only cached in memory so
+        uploaded notes are never written to disk.
+        
+        Args:
+            queries: Query texts
+            
+        Returns:
+            float32 matrix with one row per query, in input order
+        """
+        keys = [self._text_key(query) for query in queries]
+        vectors = [_lru_get(self._query_embed_cache, key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            fresh = self.embeddings.embed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = np.asarray(vector, dtype="float32")
+                _lru_put(self._query_embed_cache, keys[i], vectors[i], QUERY_EMBED_CACHE_SIZE)
+        return np.stack(vectors)
+    
+    def batch_semantic_search(self, vectorstore: FAISS, queries: List[str], k: int = 5) -> List[List[Document]]:
+        """
+        Search a vectorstore for several queries with one embeddings request
+        and one FAISS search over the stacked query matrix.
+        
+        Args:
+            vectorstore: FAISS vectorstore to search
+            queries: Search query texts
+            k: Number of results to return per query
+            
+        Returns:
+            List of relevant documents for each query, in query order
+        """
+        if not queries:
+            return []
+        
+        query_vectors = self._embed_queries(queries)
+        _, indices = vectorstore.index.search(query_vectors, k)
+        
+        return [
+            [
+                vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+                for i in row if i != -1  # -1 pads rows with fewer than k hits
+            ]
+            for row in indices.tolist()
+        ]
+    
+    def _text_key(self, text: str) -> bytes:
+        """Cache key for a text, ignoring case and whitespace differences."""
+        normalized = _WS_RE.sub(" ", text).strip().casefold()
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+    
     def infer_subtopic(self, text: str) -> str:
         """
         Infer subtopic from given text using OpenAI LLM.
@@ -99,17 +578,190 @@ class RAGPipeline:
         Returns:
             Inferred subtopic string
         """
-        prompt = (
+        key = self._text_key(text)
+        subtopic = _lru_get(self._subtopic_cache, key)
+        if subtopic is not None:
+            return subtopic
+        
+        try:
+            response = self.llm.invoke(self._subtopic_prompt(text))
+        except Exception as e:
+            print(f"❌ Subtopic inference failed: {e}")
+            return "General"
+        subtopic = response.content.strip()
+        _lru_put(self._subtopic_cache, key, subtopic, SUBTOPIC_CACHE_SIZE)
+        return subtopic
+    
+    async def ainfer_subtopic(self, text: str) -> str:
+        """
+        Async version of infer_subtopic.
+        
+        Args:
+            text: Input text to analyze
+            
+        Returns:
+            Inferred subtopic string
+        """
+        key = self._text_key(text)
+        subtopic = _lru_get(self._subtopic_cache, key)
+        if subtopic is not None:
+            return subtopic
+        
+        try:
+            response = await self.llm.ainvoke(self._subtopic_prompt(text))
+        except Exception as e:
+            print(f"❌ Subtopic inference failed: {e}")
+            return "General"
+        subtopic = response.content.strip()
+        _lru_put(self._subtopic_cache, key, subtopic, SUBTOPIC_CACHE_SIZE)
+        return subtopic
+    
+    @staticmethod
+    def _subtopic_prompt(text: str) -> str:
+        """Build the prompt asking for a single text's subtopic."""
+        return (
             f"Read the following academic content and suggest the most relevant subtopic "
             f"(like 'Firewall', 'Water Pollution', etc.) in 2-3 words:\n\n{text}\n\nSubtopic:"
         )
+    
+    def infer_subtopics(self, texts: List[str]) -> List[str]:
+        """
+        Infer subtopics for several texts with batched LLM calls.
+        
+        Texts inferred before are answered from the cache and left out of the
+        prompts. The rest are sent SUBTOPIC_GROUP_SIZE at a time, with the
+        groups running concurrently; a group whose answer cannot be used falls
+        back to one call per text.
         
+        Args:
+            texts: Input texts to analyze
+            
+        Returns:
+            Inferred subtopic for each text, in input order; "General" where
+            inference failed
+        """
+        keys, subtopics, missing = self._cached_subtopics(texts)
+        if missing:
+            groups = self._subtopic_groups([texts[i] for i in missing])
+            with ThreadPoolExecutor(max_workers=min(len(groups), SUBTOPIC_CONCURRENCY)) as executor:
+                group_results = executor.map(self._infer_subtopic_group, groups)
+                results = [subtopic for group in group_results for subtopic in group]
+            self._fill_subtopics(keys, subtopics, missing, results)
+        return subtopics
+    
+    def _infer_subtopic_group(self, texts: List[str]) -> List[Optional[str]]:
+        """Infer one group's subtopics in a single call, else one call per text; None where that fails too."""
         try:
-            response = self.llm.invoke(prompt)
-            return response.content.strip()
+            response = self.llm.invoke(self._subtopics_prompt(texts))
+            parsed = self._parse_subtopics(response.content, len(texts))
         except Exception as e:
-            print(f"❌ Subtopic inference failed: {e}")
-            return "General"
+            print(f"❌ Batch subtopic inference failed: {e}")
+            parsed = None
+        if parsed is not None:
+            return parsed
+        
+        results = []
+        for text in texts:
+            try:
+                results.append(self.llm.invoke(self._subtopic_prompt(text)).content.strip() or None)
+            except Exception as e:
+                print(f"❌ Subtopic inference failed: {e}")
+                results.append(None)
+        return results
+    
+    async def ainfer_subtopics(self, texts: List[str]) -> List[str]:
+        """
+        Async version of infer_subtopics.
+        
+        Args:
+            texts: Input texts to analyze
+            
+        Returns:
+            Inferred subtopic for each text, in input order
+        """
+        keys, subtopics, missing = self._cached_subtopics(texts)
+        if missing:
+            semaphore = asyncio.Semaphore(SUBTOPIC_CONCURRENCY)
+            groups = self._subtopic_groups([texts[i] for i in missing])
+            group_results = await asyncio.gather(
+                *(self._ainfer_subtopic_group(group, semaphore) for group in groups)
+            )
+            results = [subtopic for group in group_results for subtopic in group]
+            self._fill_subtopics(keys, subtopics, missing, results)
+        return subtopics
+    
+    async def _ainfer_subtopic_group(self, texts: List[str], semaphore: asyncio.Semaphore) -> List[Optional[str]]:
+        """Async version of _infer_subtopic_group; the semaphore caps requests in flight."""
+        async with semaphore:
+            try:
+                response = await self.llm.ainvoke(self._subtopics_prompt(texts))
+                parsed = self._parse_subtopics(response.content, len(texts))
+            except Exception as e:
+                print(f"❌ Batch subtopic inference failed: {e}")
+                parsed = None
+            if parsed is not None:
+                return parsed
+            
+            async def infer_one(text: str) -> Optional[str]:
+                try:
+                    response = await self.llm.ainvoke(self._subtopic_prompt(text))
+                except Exception as e:
+                    print(f"❌ Subtopic inference failed: {e}")
+                    return None
+                return response.content.strip() or None
+            
+            return list(await asyncio.gather(*(infer_one(text) for text in texts)))
+    
+    def _cached_subtopics(self, texts: List[str]) -> Tuple[List[bytes], List[Optional[str]], List[int]]:
+        """Look texts up in the subtopic cache; returns keys, subtopics and uncached positions."""
+        keys = [self._text_key(text) for text in texts]
+        subtopics = [_lru_get(self._subtopic_cache, key) for key in keys]
+        missing = [i for i, subtopic in enumerate(subtopics) if subtopic is None]
+        return keys, subtopics, missing
+    
+    @staticmethod
+    def _subtopic_groups(texts: List[str]) -> List[List[str]]:
+        """Split texts into groups of at most SUBTOPIC_GROUP_SIZE, one batched request each."""
+        return [texts[i:i + SUBTOPIC_GROUP_SIZE] for i in range(0, len(texts), SUBTOPIC_GROUP_SIZE)]
+    
+    def _fill_subtopics(self, keys: List[bytes], subtopics: List[Optional[str]], missing: List[int],
+                        results: List[Optional[str]]):
+        """Fill uncached positions from the inferred results, caching usable answers."""
+        for i, subtopic in zip(missing, results):
+            if subtopic is None:
+                subtopics[i] = "General"
+            else:
+                subtopics[i] = subtopic
+                _lru_put(self._subtopic_cache, keys[i], subtopic, SUBTOPIC_CACHE_SIZE)
+    
+    @staticmethod
+    def _subtopics_prompt(texts: List[str]) -> str:
+        """Build the prompt asking for a JSON array with one subtopic per text."""
+        excerpts = "\n\n".join(
+            f"Excerpt {i}:\n{text}" for i, text in enumerate(texts, 1)
+        )
+        return (
+            f"Read the following {len(texts)} academic excerpts and suggest the most relevant "
+            f"subtopic (like 'Firewall', 'Water Pollution', etc.) in 2-3 words for each one.\n"
+            f"Return ONLY a JSON array of {len(texts)} strings, one per excerpt, in order.\n\n"
+            f"{excerpts}\n\nSubtopics:"
+        )
+    
+    @staticmethod
+    def _parse_subtopics(content: str, count: int) -> Optional[List[str]]:
+        """Parse the model's JSON array; None when it is not usable."""
+        try:
+            content = content.strip()
+            # Tolerate a Markdown code fence around the array
+            subtopics = json.loads(content[content.find("["):content.rfind("]") + 1])
+        except Exception as e:
+            print(f"❌ Batch subtopic inference failed: {e}")
+            return None
+        
+        if not isinstance(subtopics, list) or len(subtopics) != count:
+            print("❌ Batch subtopic inference returned the wrong number of subtopics")
+            return None
+        return [str(subtopic).strip() or "General" for subtopic in subtopics]
     
     def get_relevant_pyqs(self, session: Session, query: str, subject: str = None, k: int = 3) -> List[Document]:
         """
@@ -137,23 +789,7 @@ class RAGPipeline:
         Returns:
             List of text chunks
         """
-        try:
-            import nltk
-            from nltk.tokenize import sent_tokenize
-            
-            sentences = sent_tokenize(text)
-            chunks = []
-            
-            for i in range(0, len(sentences), max_sentences):
-                chunk = ' '.join(sentences[i:i + max_sentences])
-                chunks.append(chunk)
-            
-            return chunks
-        except Exception as e:
-            print(f"❌ Text chunking error: {e}")
-            # Fallback: simple splitting
-            chunk_size = 1000
-            return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        return chunk_text_by_sentences(text, max_sentences)
     
     def process_notes_and_match_pyqs(self, text: str, subject: str, session: Session, k: int = 3) -> List[dict]:
         """
@@ -168,49 +804,106 @@ class RAGPipeline:
         Returns:
             List of processing results with chunks, subtopics, and matches
         """
-        chunks = self.nlp_chunk_text(text)
-        results = []
+        return asyncio.run(self.aprocess_notes_and_match_pyqs(text, subject, session, k))
+    
+    async def aprocess_notes_and_match_pyqs(self, text: str, subject: str, session: Session, k: int = 3) -> List[dict]:
+        """
+        Async version of process_notes_and_match_pyqs.
         
-        for chunk in chunks:
-            if not chunk.strip():
-                continue
-                
-            subtopic = self.infer_subtopic(chunk)
-            matches = self.get_relevant_pyqs(session, chunk, subject, k=k)
+        The vectorstore is loaded once up front. Bounded, concurrent LLM
+        batches infer the chunks' subtopics while one batched search matches
+        every chunk, so their network round trips overlap instead of adding up.
+        
+        Args:
+            text: Notes text to process
+            subject: Subject for filtering PYQs
+            session: Database session
+            k: Number of matches per chunk
             
+        Returns:
+            List of processing results with chunks, subtopics, and matches
+        """
+        chunks = [chunk for chunk in self.nlp_chunk_text(text) if chunk.strip()]
+        if not chunks:
+            return []
+        
+        # Repeated chunks (e.g. boilerplate headers) are processed once
+        unique_chunks = list(dict.fromkeys(chunks))
+        vectorstore = self.load_vectorstore_from_db(session, subject)
+        
+        async def search() -> List[List[Document]]:
+            if not vectorstore:
+                return [[] for _ in unique_chunks]
+            try:
+                # Blocking embeddings request + FAISS search, kept off the event loop
+                return await asyncio.to_thread(self.batch_semantic_search, vectorstore, unique_chunks, k)
+            except Exception as e:
+                print(f"❌ Semantic search error: {e}")
+                return [[] for _ in unique_chunks]
+        
+        subtopics, all_matches = await asyncio.gather(self.ainfer_subtopics(unique_chunks), search())
+        processed = dict(zip(unique_chunks, zip(subtopics, all_matches)))
+        
+        results = []
+        for chunk in chunks:
+            subtopic, matches = processed[chunk]
             results.append({
                 "chunk": chunk,
                 "subtopic": subtopic,
-                "matches": matches,
+                "matches": list(matches),
                 "match_count": len(matches)
             })
-        
         return results
 
-# Initialize global RAG pipeline instance
-rag_pipeline = RAGPipeline()
+@functools.lru_cache(maxsize=None)
+def _get_pipeline() -> RAGPipeline:
+    """Create the shared RAG pipeline, and its OpenAI clients, on first use."""
+    return RAGPipeline()
+
+def clear_vectorstore_cache(subject: str = None):
+    """Drop the shared pipeline's cached vectorstores, without creating the pipeline."""
+    if _get_pipeline.cache_info().currsize:
+        _get_pipeline().clear_vectorstore_cache(subject)
+
+def __getattr__(name):
+    """Resolve the legacy rag_pipeline instance attribute on first access."""
+    if name == "rag_pipeline":
+        return _get_pipeline()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Backward compatibility functions
 def load_vectorstore_from_db(session: Session, subject: str = None) -> Optional[FAISS]:
     """Backward compatibility wrapper."""
-    return rag_pipeline.load_vectorstore_from_db(session, subject)
+    return _get_pipeline().load_vectorstore_from_db(session, subject)
 
 def semantic_search_db(session: Session, query: str, subject: str = None, k: int = 5) -> List[Document]:
     """Backward compatibility wrapper."""
-    return rag_pipeline.semantic_search_db(session, query, subject, k)
+    return _get_pipeline().semantic_search_db(session, query, subject, k)
+
+def semantic_search_db_batch(session: Session, queries: List[str], subject: str = None, k: int = 5) -> List[List[Document]]:
+    """Backward compatibility wrapper."""
+    return _get_pipeline().semantic_search_db_batch(session, queries, subject, k)
 
 def infer_subtopic(text: str) -> str:
     """Backward compatibility wrapper."""
-    return rag_pipeline.infer_subtopic(text)
+    return _get_pipeline().infer_subtopic(text)
+
+def infer_subtopics(texts: List[str]) -> List[str]:
+    """Backward compatibility wrapper."""
+    return _get_pipeline().infer_subtopics(texts)
 
 def get_relevant_pyqs(session: Session, query: str, subject: str = None, k: int = 3) -> List[Document]:
     """Backward compatibility wrapper."""
-    return rag_pipeline.get_relevant_pyqs(session, query, subject, k)
+    return _get_pipeline().get_relevant_pyqs(session, query, subject, k)
 
 def nlp_chunk_text(text: str, max_sentences: int = 5) -> List[str]:
     """Backward compatibility wrapper."""
-    return rag_pipeline.nlp_chunk_text(text, max_sentences)
+    return _get_pipeline().nlp_chunk_text(text, max_sentences)
 
 def process_notes_and_match_pyqs(text: str, subject: str, session: Session, k: int = 3) -> List[dict]:
     """Backward compatibility wrapper."""
-    return rag_pipeline.process_notes_and_match_pyqs(text, subject, session, k)
+    return _get_pipeline().process_notes_and_match_pyqs(text, subject, session, k)
+
+async def aprocess_notes_and_match_pyqs(text: str, subject: str, session: Session, k: int = 3) -> List[dict]:
+    """Backward compatibility wrapper."""
+    return await _get_pipeline().aprocess_notes_and_match_pyqs(text, subject, session, k)
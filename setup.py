@@ -3,14 +3,32 @@ Database setup script for IntelliJect.
 Creates database tables and initializes the application.
 """
 import os
-from database import Base, engine
-from models import PYQ, PDFHistory
+import sys
+from database import Base, create_missing_indexes, get_engine, get_session_factory
+from models import PYQ, Subject, PDFHistory
+import crud
 
-def setup_database():
-    """Create all database tables."""
+def setup_database(dedupe: bool = False):
+    """
+    Create all database tables and any indexes missing from existing ones.
+    
+    Args:
+        dedupe: Delete duplicate rows that block a missing unique index
+    """
     print("🔧 Creating database tables...")
     try:
+        engine = get_engine()
         Base.metadata.create_all(bind=engine)
+        created = create_missing_indexes(engine, dedupe=dedupe)
+        if created:
+            print(f"✅ Created {created} missing index(es)")
+        # Databases created before the subjects table existed list their PYQ subjects at once
+        db = get_session_factory()()
+        try:
+            with db.begin():
+                crud.refresh_subjects(db)
+        finally:
+            db.close()
         print("✅ Database tables created successfully!")
         return True
     except Exception as e:
@@ -18,4 +36,4 @@ def setup_database():
         return False
 
 if __name__ == "__main__":
-    setup_database()
\ No newline at end of file
+    setup_database(dedupe="--dedupe" in sys.argv[1:])
\ No newline at end of file
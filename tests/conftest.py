@@ -0,0 +1,33 @@
+"""
+Shared pytest fixtures.
+Each test gets an empty SQLite database in its own working directory.
+"""
+import pytest
+import crud
+import database
+import models  # registers the tables on Base.metadata
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Point the app at a fresh SQLite file and create the schema."""
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.chdir(tmp_path)
+    database._probe_engine.cache_clear()
+    database._build_engine.cache_clear()
+    crud.invalidate_subjects_cache()
+    
+    engine = database.get_engine()
+    database.Base.metadata.create_all(bind=engine)
+    yield engine
+    
+    engine.dispose()
+    database._build_engine.cache_clear()
+    database._probe_engine.cache_clear()
+    crud.invalidate_subjects_cache()
+
+@pytest.fixture
+def db(engine):
+    """Session bound to the test database."""
+    session = database.get_session_factory()()
+    yield session
+    session.close()
@@ -0,0 +1,89 @@
+"""Tests for PYQ storage and the subject list in crud.py."""
+from sqlalchemy import insert
+import crud
+import models
+from database import DEFAULT_SUBJECTS
+
+def test_store_pyqs_updates_existing_question(db):
+    assert crud.store_pyqs(db, [{"question": "What is a firewall?", "marks": 2}], "Cyber Security") == 1
+    assert crud.store_pyqs(db, [{"question": "What is a firewall?", "marks": 5, "unit": "3"}], "Cyber Security") == 1
+    
+    rows = db.query(models.PYQ).all()
+    assert len(rows) == 1
+    assert rows[0].marks == 5
+    assert rows[0].unit == "3"
+
+def test_store_pyqs_keeps_last_of_repeated_questions(db):
+    pyqs = [
+        {"question": "Define entropy.", "marks": 1},
+        {"question": "Define entropy.", "marks": 4},
+        {"question": ""},
+        {"marks": 3},
+    ]
+    assert crud.store_pyqs(db, pyqs, "Physics") == 1
+    
+    (row,) = db.query(models.PYQ).all()
+    assert row.question == "Define entropy."
+    assert row.marks == 4
+
+def test_store_pyqs_keeps_same_question_in_other_subjects(db):
+    crud.store_pyqs(db, [{"question": "Explain sampling."}], "Probability and Statistics")
+    crud.store_pyqs(db, [{"question": "Explain sampling."}], "Environmental Sciences")
+    
+    assert db.query(models.PYQ).count() == 2
+
+def test_store_pyqs_defaults_missing_fields(db):
+    crud.store_pyqs(db, [{"question": "What is malware?"}], "Cyber Security")
+    
+    row = db.query(models.PYQ).one()
+    assert row.to_dict() == {
+        "id": row.id,
+        "question": "What is malware?",
+        "year": "",
+        "semester": "",
+        "branch": "",
+        "unit": "",
+        "marks": 0,
+        "sub_topic": "",
+        "subject": "Cyber Security",
+    }
+
+def test_store_pyqs_without_commit_leaves_transaction_to_caller(db):
+    db.begin()
+    assert crud.store_pyqs(db, [{"question": "Q1"}, {"question": "Q2"}], "Mathematics", commit=False) == 2
+    db.rollback()
+    
+    assert db.query(models.PYQ).count() == 0
+
+def test_store_pyqs_lists_new_subject(db):
+    crud.store_pyqs(db, [{"question": "Q1"}], "Existing")
+    assert crud.get_subjects(db) == ["Existing"]
+    
+    crud.store_pyqs(db, [{"question": "Q2"}], "New Subject")
+    assert crud.get_subjects(db) == ["Existing", "New Subject"]
+
+def test_bulk_store_pyqs_upserts_and_lists_subject(engine, db):
+    assert crud.bulk_store_pyqs(engine, [{"question": "Q", "marks": 1}], "Chemistry") == 1
+    assert crud.bulk_store_pyqs(engine, [{"question": "Q", "marks": 2}], "Chemistry") == 1
+    
+    assert [row.marks for row in db.query(models.PYQ)] == [2]
+    assert crud.get_subjects(db) == ["Chemistry"]
+
+def test_refresh_subjects_backfills_from_pyqs(db):
+    db.execute(insert(models.PYQ), [{"subject": "Legacy", "question": "Q"}])
+    db.commit()
+    
+    with db.begin():
+        crud.refresh_subjects(db)
+    
+    assert crud.get_subjects(db) == ["Legacy"]
+
+def test_get_subjects_falls_back_to_defaults_when_empty(db):
+    assert crud.get_subjects(db) == DEFAULT_SUBJECTS
+
+def test_copy_csv_field_distinguishes_null_from_empty_string():
+    assert crud._copy_csv_field(None) == ""
+    assert crud._copy_csv_field("") == '""'
+    assert crud._copy_csv_field('say "hi"') == '"say ""hi"""'
+    assert crud._copy_csv_field(2) == "2"
+    assert crud._copy_csv_field(2.5) == "2.5"
@@ -0,0 +1,52 @@
+"""Tests for parsing and loading subject JSON files in data_loader.py."""
+import json
+import pytest
+import data_loader
+import models
+
+@pytest.mark.parametrize("value, expected", [
+    (5, 5),
+    (-3, 0),
+    (2.5, 2),
+    ("2.5", 2),
+    ("3.", 3),
+    ("7", 7),
+    ("-1", 0),
+    ("abc", 0),
+    ("", 0),
+    (None, 0),
+    (float("nan"), 0),
+])
+def test_parse_marks(value, expected):
+    assert data_loader._parse_marks(value) == expected
+
+def _write_subject_file(path, items):
+    path.write_text(json.dumps(items), encoding="utf-8")
+    return str(path)
+
+def test_iter_pyqs_from_json(tmp_path):
+    file_path = _write_subject_file(tmp_path / "subject.json", [
+        {"question": "What is a firewall?", "topic": "Firewall", "marks": "5", "year": 2023},
+        {"question": "   "},
+        {"question": "Define phishing.", "sub_topic": "Attacks"},
+    ])
+    
+    pyqs = list(data_loader.iter_pyqs_from_json(file_path, "Cyber Security"))
+    
+    assert [pyq["question"] for pyq in pyqs] == ["What is a firewall?", "Define phishing."]
+    assert pyqs[0]["sub_topic"] == "Firewall"
+    assert pyqs[0]["marks"] == 5
+    assert pyqs[0]["year"] == "2023"
+    assert pyqs[1]["sub_topic"] == "Attacks"
+    assert pyqs[1]["year"] == "2024"
+    assert all(pyq["subject"] == "Cyber Security" for pyq in pyqs)
+
+def test_load_subject_skips_unchanged_file(engine, db, tmp_path):
+    file_path = _write_subject_file(tmp_path / "subject.json", [{"question": "Q1"}, {"question": "Q2"}])
+    
+    assert data_loader._load_subject("Cyber Security", file_path) == 2
+    assert data_loader._load_subject("Cyber Security", file_path) is None
+    
+    _write_subject_file(tmp_path / "subject.json", [{"question": "Q3"}])
+    assert data_loader._load_subject("Cyber Security", file_path) == 1
+    assert [row.question for row in db.query(models.PYQ)] == ["Q3"]
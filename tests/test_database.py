@@ -0,0 +1,67 @@
+"""Tests for engine options and index migration in database.py."""
+import logging
+import sqlite3
+from sqlalchemy import create_engine
+import database
+
+def test_executemany_mode_only_for_psycopg2():
+    psycopg2 = database._engine_options("postgresql+psycopg2://user@host/db", "postgresql")
+    psycopg3 = database._engine_options("postgresql+psycopg://user@host/db", "postgresql")
+    
+    assert psycopg2["executemany_mode"] == "values_plus_batch"
+    assert "executemany_mode" not in psycopg3
+    assert "executemany_mode" not in database._engine_options("sqlite:///./test.db", "sqlite")
+
+def _create_legacy_pyqs_table(path):
+    """Create a pyqs table as older versions did, without the unique index, holding a duplicate."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE pyqs (
+            id INTEGER PRIMARY KEY, question VARCHAR NOT NULL, year VARCHAR,
+            semester VARCHAR, branch VARCHAR, unit VARCHAR, marks FLOAT,
+            sub_topic VARCHAR, subject VARCHAR NOT NULL
+        );
+        INSERT INTO pyqs (question, subject) VALUES ('Q', 'S'), ('Q', 'S'), ('R', 'S');
+    """)
+    conn.close()
+
+def _index_names(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+
+def _row_count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM pyqs").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_create_missing_indexes_keeps_duplicates_by_default(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    _create_legacy_pyqs_table("intelliject.db")
+    engine = create_engine("sqlite:///./intelliject.db")
+    
+    with caplog.at_level(logging.WARNING):
+        database.create_missing_indexes(engine)
+    engine.dispose()
+    
+    assert _row_count("intelliject.db") == 3
+    assert "uq_pyq_subject_question" not in _index_names("intelliject.db")
+    assert "ix_pyq_subject_subtopic" in _index_names("intelliject.db")
+    assert "--dedupe" in caplog.text
+
+def test_create_missing_indexes_dedupe_removes_duplicates(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    _create_legacy_pyqs_table("intelliject.db")
+    engine = create_engine("sqlite:///./intelliject.db")
+    
+    with caplog.at_level(logging.WARNING):
+        database.create_missing_indexes(engine, dedupe=True)
+    engine.dispose()
+    
+    assert _row_count("intelliject.db") == 2
+    assert "uq_pyq_subject_question" in _index_names("intelliject.db")
+    assert "Deleted 1 duplicate pyqs rows" in caplog.text
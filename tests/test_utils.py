@@ -0,0 +1,90 @@
+"""Tests for the text and file helpers in utils.py."""
+import fitz  # PyMuPDF
+import pytest
+import utils
+
+def test_chunk_text_returns_short_text_whole():
+    assert utils.chunk_text("short text", chunk_size=500, overlap=50) == ["short text"]
+    assert utils.chunk_text("", chunk_size=500) == []
+
+def test_chunk_text_stops_at_end_of_text():
+    chunks = utils.chunk_text("a" * 1200, chunk_size=500, overlap=50)
+    
+    # No shrinking copies of the last chunk's tail after the end is reached
+    assert [len(chunk) for chunk in chunks] == [500, 500, 300]
+
+def test_chunk_text_breaks_at_words_with_overlap():
+    text = " ".join(["word"] * 300)
+    chunks = utils.chunk_text(text, chunk_size=100, overlap=20)
+    
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.split(" ") == ["word"] * len(chunk.split(" ")) for chunk in chunks)
+    assert chunks[-1].endswith("word")
+    assert len(chunks) == 20
+
+def test_clean_extracted_text_drops_page_numbers_and_short_lines():
+    text = "Intro line\n12\nBody  text\n  ab \nEnd"
+    
+    assert utils.clean_extracted_text(text) == "Intro line Body text End"
+    assert utils.clean_extracted_text("") == ""
+
+@pytest.mark.parametrize("filename, subject, doc_type", [
+    ("cs_pyq_2023.pdf", "Computer Science", "Previous Year Questions"),
+    ("ece_sem3.pdf", "Electronics and Communication", None),
+    ("civil_eng_quiz.pdf", "Civil Engineering", "Quiz"),
+    ("chem_assign_eee.pdf", "Electrical and Electronics", "Assignment"),
+    # Substring matching, earlier table entries first
+    ("mathematics.pdf", "Computer Science", None),
+    ("examnotes.pdf", None, "Study Notes"),
+    ("mynotes_it.pdf", "Information Technology", "Study Notes"),
+    ("random.pdf", None, None),
+])
+def test_extract_metadata_subject_and_type(filename, subject, doc_type):
+    metadata = utils.extract_metadata_from_filename(filename)
+    
+    assert metadata["subject"] == subject
+    assert metadata["type"] == doc_type
+
+@pytest.mark.parametrize("filename, year, semester", [
+    ("cs 2023 sem-4.pdf", "2023", "Semester 4"),
+    ("notes 5 sem 1999.pdf", "1999", "Semester 5"),
+    ("phys-semester 7.pdf", None, "Semester 7"),
+    # Underscores are word characters, so they do not delimit years or semesters
+    ("cs_2023_sem4.pdf", None, None),
+])
+def test_extract_metadata_year_and_semester(filename, year, semester):
+    metadata = utils.extract_metadata_from_filename(filename)
+    
+    assert metadata["year"] == year
+    assert metadata["semester"] == semester
+
+@pytest.mark.parametrize("size, expected", [
+    (0, "0 B"),
+    (1, "1.0 B"),
+    (1023, "1023.0 B"),
+    (1024, "1.0 KB"),
+    (1536.0, "1.5 KB"),
+    (123456789, "117.74 MB"),
+    (5 * 1024 ** 4, "5.0 TB"),
+    (3 * 1024 ** 5, "3072.0 TB"),
+])
+def test_format_file_size(size, expected):
+    assert utils.format_file_size(size) == expected
+
+def test_validate_pdf_file(tmp_path):
+    valid = tmp_path / "valid.pdf"
+    doc = fitz.open()
+    doc.new_page()
+    doc.save(str(valid))
+    doc.close()
+    
+    truncated = tmp_path / "truncated.pdf"
+    truncated.write_bytes(valid.read_bytes()[:-200])
+    not_pdf = tmp_path / "notes.pdf"
+    not_pdf.write_bytes(b"plain text, not a PDF")
+    
+    assert utils.validate_pdf_file(str(valid))
+    assert utils.validate_pdf_file(str(valid), check_pages=True)
+    assert not utils.validate_pdf_file(str(truncated))
+    assert not utils.validate_pdf_file(str(not_pdf))
+    assert not utils.validate_pdf_file(str(tmp_path / "missing.pdf"))
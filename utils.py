@@ -4,9 +4,23 @@ Provides PDF text extraction, text processing, and formatting utilities.
 """
 import fitz  # PyMuPDF
 import re
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
 from pathlib import Path
 
+try:
+    import blingfire
+except ImportError:
+    blingfire = None
+
+# Sentence boundary: terminal punctuation, whitespace, then a capital letter
+_SENT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+_WS_RE = re.compile(r'\s+')
+
+# Whole lines that are only a number or at most two characters (page numbers, stray marks)
+_LINE_DROP_RE = re.compile(r'(?m)^[^\S\n]*(?:\d+|\S{0,2})[^\S\n]*(?:\n|$)')
+
 def extract_text_from_pdf(pdf_path: str) -> List[str]:
     """
     Extract text from each page of a PDF file.
@@ -24,24 +38,60 @@ def extract_text_from_pdf(pdf_path: str) -> List[str]:
     if not Path(pdf_path).exists():
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
     
-    try:
-        doc = fitz.open(pdf_path)
-        pages_text = []
+    return list(iter_pdf_pages(pdf_path))
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[str]:
+    """
+    Lazily yield the cleaned text of each page of a PDF file.
+    
+    Only one page's text is held at a time, so callers can chunk or embed
+    page N while later pages are still unread.
+    
+    Args:
+        pdf_path: Path to the PDF file
         
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text("text")
-            
-            # Clean up the extracted text
-            cleaned_text = clean_extracted_text(text)
-            pages_text.append(cleaned_text)
+    Yields:
+        Cleaned text of each page, in page order
         
-        doc.close()
-        return pages_text
+    Raises:
+        FileNotFoundError: If PDF file doesn't exist
+        Exception: If PDF cannot be processed
+    """
+    if not Path(pdf_path).exists():
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    
+    try:
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                yield clean_extracted_text(page.get_text("text"))
     
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
+def extract_texts_from_pdfs(pdf_paths: List[str], max_workers: Optional[int] = None) -> List[List[str]]:
+    """
+    Extract text from several PDF files in parallel worker processes.
+    
+    Prefer this over calling extract_text_from_pdf in a loop when ingesting
+    a directory of PDFs, so every CPU core parses a file.
+    
+    Args:
+        pdf_paths: Paths to the PDF files
+        max_workers: Number of worker processes (defaults to the CPU count)
+        
+    Returns:
+        List of per-page text lists, in the same order as pdf_paths
+        
+    Raises:
+        FileNotFoundError: If a PDF file doesn't exist
+        Exception: If a PDF cannot be processed
+    """
+    if len(pdf_paths) < 2:
+        return [extract_text_from_pdf(path) for path in pdf_paths]
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(extract_text_from_pdf, pdf_paths, chunksize=2))
+
 def clean_extracted_text(text: str) -> str:
     """
     Clean and normalize extracted text from PDF.
@@ -55,24 +105,9 @@ def clean_extracted_text(text: str) -> str:
     if not text:
         return ""
     
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove page numbers and headers/footers (simple heuristic)
-    lines = text.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        # Skip very short lines that might be page numbers
-        if len(line) < 3:
-            continue
-        # Skip lines that are just numbers (likely page numbers)
-        if line.isdigit():
-            continue
-        cleaned_lines.append(line)
-    
-    return ' '.join(cleaned_lines).strip()
+    # Remove page numbers and very short lines (simple header/footer heuristic),
+    # then collapse the remaining whitespace
+    return _WS_RE.sub(' ', _LINE_DROP_RE.sub('', text)).strip()
 
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
     """
@@ -107,12 +142,14 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]
         if chunk:
             chunks.append(chunk)
         
-        # Move start position considering overlap
-        start = max(start + 1, end - overlap)
-        
-        # Prevent infinite loop
-        if start >= text_length:
+        # The last chunk reached the end; stepping back by the overlap would
+        # only re-emit shrinking copies of its tail
+        if end >= text_length:
             break
+        
+        # Move start position considering overlap, but always past the current start
+        next_start = end - overlap
+        start = next_start if next_start > start else end
     
     return chunks
 
@@ -127,28 +164,34 @@ def chunk_text_by_sentences(text: str, max_sentences: int = 5) -> List[str]:
     Returns:
         List of text chunks
     """
-    try:
-        import nltk
-        from nltk.tokenize import sent_tokenize
-        
-        # Download required NLTK data if not present
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt', quiet=True)
-        
-        sentences = sent_tokenize(text)
-        chunks = []
-        
-        for i in range(0, len(sentences), max_sentences):
-            chunk = ' '.join(sentences[i:i + max_sentences])
-            chunks.append(chunk.strip())
+    sentences = split_sentences(text)
+    return [
+        ' '.join(sentences[i:i + max_sentences])
+        for i in range(0, len(sentences), max_sentences)
+    ]
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences.
+    
+    Uses blingfire's compiled tokenizer when it is installed, otherwise a
+    precompiled regex that breaks after ., ! or ? followed by a capital.
+    
+    Args:
+        text: Input text
         
-        return chunks
+    Returns:
+        List of non-empty, stripped sentences
+    """
+    if not text:
+        return []
+    
+    if blingfire is not None:
+        sentences = blingfire.text_to_sentences(text).split('\n')
+    else:
+        sentences = _SENT_RE.split(text)
     
-    except ImportError:
-        # Fallback to simple chunking if NLTK not available
-        return chunk_text(text, chunk_size=1000)
+    return [sentence.strip() for sentence in sentences if sentence.strip()]
 
 def highlight_chunks(text: str, highlight_class: str = "highlight") -> str:
     """
@@ -166,6 +209,45 @@ def highlight_chunks(text: str, highlight_class: str = "highlight") -> str:
     
     return f'<span class="{highlight_class}">{text}</span>'
 
+# Filename abbreviations recognized by extract_metadata_from_filename, in priority order
+SUBJECT_ABBREVIATIONS = {
+    'cs': 'Computer Science',
+    'it': 'Information Technology',
+    'ece': 'Electronics and Communication',
+    'eee': 'Electrical and Electronics',
+    'mech': 'Mechanical Engineering',
+    'civil': 'Civil Engineering',
+    'chem': 'Chemical Engineering',
+    'math': 'Mathematics',
+    'phys': 'Physics',
+    'eng': 'Engineering'
+}
+
+DOCUMENT_TYPES = {
+    'pyq': 'Previous Year Questions',
+    'notes': 'Study Notes',
+    'lab': 'Laboratory Manual',
+    'assign': 'Assignment',
+    'quiz': 'Quiz',
+    'exam': 'Examination'
+}
+
+def _substring_alternation(keys) -> re.Pattern:
+    """
+    Match every occurrence of any key anywhere in a name.
+    
+    The lookahead reports overlapping matches too, so picking the match with
+    the earliest table entry gives the same result as testing each key in turn.
+    """
+    return re.compile('(?=(' + '|'.join(map(re.escape, keys)) + '))')
+
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+_SEMESTER_RE = re.compile(r'\bsem(?:ester)?[\s-]*([1-8])\b|\b([1-8])[\s-]*sem\b')
+_SUBJECT_RE = _substring_alternation(SUBJECT_ABBREVIATIONS)
+_SUBJECT_RANK = {abbr: rank for rank, abbr in enumerate(SUBJECT_ABBREVIATIONS)}
+_TYPE_RE = _substring_alternation(DOCUMENT_TYPES)
+_TYPE_RANK = {pattern: rank for rank, pattern in enumerate(DOCUMENT_TYPES)}
+
 def extract_metadata_from_filename(filename: str) -> dict:
     """
     Extract metadata from PDF filename using common naming patterns.
@@ -187,77 +269,62 @@ def extract_metadata_from_filename(filename: str) -> dict:
     name = Path(filename).stem.lower()
     
     # Extract year (4-digit number)
-    year_match = re.search(r'\b(19|20)\d{2}\b', name)
+    year_match = _YEAR_RE.search(name)
     if year_match:
         metadata['year'] = year_match.group()
     
     # Extract semester
-    semester_patterns = [
-        r'\bsem[\s-]*([1-8])\b',
-        r'\b([1-8])[\s-]*sem\b',
-        r'\bsemester[\s-]*([1-8])\b'
-    ]
+    semester_match = _SEMESTER_RE.search(name)
+    if semester_match:
+        metadata['semester'] = f"Semester {semester_match.group(1) or semester_match.group(2)}"
     
-    for pattern in semester_patterns:
-        match = re.search(pattern, name)
-        if match:
-            metadata['semester'] = f"Semester {match.group(1)}"
-            break
+    # Extract common subject abbreviations, preferring earlier table entries
+    subjects = _SUBJECT_RE.findall(name)
+    if subjects:
+        metadata['subject'] = SUBJECT_ABBREVIATIONS[min(subjects, key=_SUBJECT_RANK.__getitem__)]
     
-    # Extract common subject abbreviations
-    subject_patterns = {
-        'cs': 'Computer Science',
-        'it': 'Information Technology',
-        'ece': 'Electronics and Communication',
-        'eee': 'Electrical and Electronics',
-        'mech': 'Mechanical Engineering',
-        'civil': 'Civil Engineering',
-        'chem': 'Chemical Engineering',
-        'math': 'Mathematics',
-        'phys': 'Physics',
-        'eng': 'Engineering'
-    }
-    
-    for abbr, full_name in subject_patterns.items():
-        if abbr in name:
-            metadata['subject'] = full_name
-            break
-    
-    # Extract document type
-    type_patterns = {
-        'pyq': 'Previous Year Questions',
-        'notes': 'Study Notes',
-        'lab': 'Laboratory Manual',
-        'assign': 'Assignment',
-        'quiz': 'Quiz',
-        'exam': 'Examination'
-    }
-    
-    for pattern, doc_type in type_patterns.items():
-        if pattern in name:
-            metadata['type'] = doc_type
-            break
+    # Extract document type, preferring earlier table entries
+    types = _TYPE_RE.findall(name)
+    if types:
+        metadata['type'] = DOCUMENT_TYPES[min(types, key=_TYPE_RANK.__getitem__)]
     
     return metadata
 
-def validate_pdf_file(file_path: str) -> bool:
+# Bytes at the end of a file searched for the %%EOF marker
+_PDF_TRAILER_SCAN = 1024
+
+def validate_pdf_file(file_path: str, check_pages: bool = False) -> bool:
     """
     Validate if a file is a valid PDF.
     
+    Checks the %PDF- header and the %%EOF trailer without parsing the
+    document; the full open is only done when check_pages is requested.
+    
     Args:
         file_path: Path to the file
+        check_pages: Also open the PDF and require at least one page
         
     Returns:
         True if valid PDF, False otherwise
     """
     try:
-        doc = fitz.open(file_path)
-        is_valid = doc.page_count > 0
-        doc.close()
-        return is_valid
+        with open(file_path, 'rb') as file:
+            head = file.read(5)
+            file.seek(0, 2)
+            file.seek(max(0, file.tell() - _PDF_TRAILER_SCAN))
+            tail = file.read()
+        if head != b'%PDF-' or b'%%EOF' not in tail:
+            return False
+        
+        if not check_pages:
+            return True
+        with fitz.open(file_path) as doc:
+            return doc.page_count > 0
     except:
         return False
 
+_UNITS = ("B", "KB", "MB", "GB", "TB")
+
 def format_file_size(size_bytes: int) -> str:
     """
     Format file size in human-readable format.
@@ -271,11 +338,9 @@ def format_file_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    import math
-    
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
+    # Each unit is 2**10 times the previous one, so the bit length picks it directly;
+    # int() also accepts float sizes
+    i = min(max(0, (int(size_bytes).bit_length() - 1) // 10), len(_UNITS) - 1)
+    s = round(size_bytes / (1 << (10 * i)), 2)
     
-    return f"{s} {size_names[i]}"
+    return f"{s} {_UNITS[i]}"